@@ -1,17 +1,28 @@
 import asyncio
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
+import functools
+import hashlib
 import logging
+import math
 import os
 import secrets
+import stat
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Union
+from typing import Any, AsyncIterator, Callable, Dict, List, Literal, Optional, Set, Tuple, Union
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Form
+from fastapi import Depends, FastAPI, File, UploadFile, HTTPException, Query, Form, Request, Response
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
 from fastapi.concurrency import run_in_threadpool
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
 
 from dotenv import load_dotenv
 
@@ -23,8 +34,18 @@ from llm_metadata_extractor import MetadataExtractor
 from elasticsearch import exceptions as es_exceptions, helpers
 from upload_status_manager import UploadStatusManager
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """应用生命周期：关闭时释放的资源（线程池、LLM 异步客户端、ES 客户端）集中在此处"""
+    yield
+    PDF_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    await metadata_extractor.aclose()
+    _close_es_clients()
+
+
 # FastAPI应用
-app = FastAPI(title="contractsSearchAPI")
+app = FastAPI(title="contractsSearchAPI", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 logger = logging.getLogger(__name__)
 
@@ -34,11 +55,26 @@ load_dotenv(BACKEND_DIR / ".env")
 FRONTEND_DIST_PATH = Path(__file__).resolve().parent.parent / "frontend" / "dist"
 FRONTEND_INDEX_FILE = FRONTEND_DIST_PATH / "index.html"
 
+# index.html 每次构建后内容不变，启动时读入内存，SPA 路由直接返回缓存内容
+FRONTEND_INDEX_BYTES: Optional[bytes] = None
+FRONTEND_INDEX_ETAG: Optional[str] = None
+
 if FRONTEND_INDEX_FILE.exists():
     assets_dir = FRONTEND_DIST_PATH / "assets"
     if assets_dir.exists():
         app.mount("/assets", StaticFiles(directory=assets_dir), name="assets")
 
+    FRONTEND_INDEX_BYTES = FRONTEND_INDEX_FILE.read_bytes()
+    FRONTEND_INDEX_ETAG = f'"{hashlib.md5(FRONTEND_INDEX_BYTES).hexdigest()}"'
+
+
+def _frontend_index_response(request: Request) -> Response:
+    """返回内存中的 index.html；浏览器缓存仍有效时返回 304"""
+    headers = {"ETag": FRONTEND_INDEX_ETAG, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == FRONTEND_INDEX_ETAG:
+        return Response(status_code=304, headers=headers)
+    return Response(content=FRONTEND_INDEX_BYTES, media_type="text/html", headers=headers)
+
 
 
 
@@ -51,6 +87,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 列表、搜索与详情接口返回大量重复键和正文文本，压缩后体积显著减小
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+# 这些接口的参数错误原先以 400 + 字符串 detail 返回，前端直接展示 detail；
+# 改由 pydantic 校验后仍保持该响应格式，其余接口沿用 FastAPI 默认的 422
+STRING_DETAIL_VALIDATION_PATHS = frozenset({
+    "/document/search",
+    "/search",
+    "/document/save-metadata",
+    "/document/save-metadata/bulk",
+})
+
+
+def _format_validation_errors(errors: List[Dict[str, Any]]) -> str:
+    """将 pydantic 校验错误列表拼接为一条可直接展示的提示"""
+    messages = []
+    for error in errors:
+        message = str(error.get("msg", ""))
+        # 自定义校验器抛出的 ValueError 会带上该前缀
+        if message.startswith("Value error, "):
+            message = message[len("Value error, "):]
+        field = ".".join(str(part) for part in error.get("loc", ()) if part not in ("query", "body"))
+        messages.append(f"{field}: {message}" if field else message)
+    return "；".join(messages) or "参数校验失败"
+
+
+@app.exception_handler(RequestValidationError)
+async def _validation_exception_handler(request: Request, exc: RequestValidationError) -> Response:
+    if request.url.path in STRING_DETAIL_VALIDATION_PATHS:
+        return ORJSONResponse(status_code=400, content={"detail": _format_validation_errors(exc.errors())})
+    return await request_validation_exception_handler(request, exc)
+
 # 创建全局实例
 pdf_to_es = PdfToElasticsearch()
 es_deleter = ElasticsearchDocumentDeleter()
@@ -59,6 +127,9 @@ doc_getter = get_document_by_filename()
 metadata_extractor = MetadataExtractor()
 status_manager = UploadStatusManager()
 
+ALLOWED_UPLOAD_TYPES = frozenset({'application/pdf'})
+MAX_UPLOAD_FILE_SIZE = 100 * 1024 * 1024  # 100MB
+
 DEFAULT_UPLOAD_PASSWORD = "20251103"
 UPLOAD_PASSWORD = os.getenv("UPLOAD_PASSWORD", DEFAULT_UPLOAD_PASSWORD)
 
@@ -76,6 +147,21 @@ def _verify_upload_password(candidate: str) -> bool:
 
 ACTIVE_UPLOAD_TASKS: Set[asyncio.Task[Any]] = set()
 
+# PDF 解析流水线使用独立线程池，避免长时间任务占满 Starlette 的默认线程池
+PDF_WORKERS = int(os.getenv("PDF_WORKERS") or os.cpu_count() or 4)
+PDF_EXECUTOR = ThreadPoolExecutor(max_workers=PDF_WORKERS, thread_name_prefix="pdf-pipeline")
+
+
+def _close_es_clients() -> None:
+    """关闭各组件持有的 Elasticsearch 客户端；组件共享同一客户端，按实例去重"""
+    components = (pdf_to_es, es_deleter, es_searcher, doc_getter)
+    clients = {id(client): client for client in (getattr(c, "es", None) for c in components) if client is not None}
+    for client in clients.values():
+        try:
+            client.close()
+        except Exception as exc:  # noqa: BLE001 - 关闭失败不影响其余资源释放
+            print(f"警告: 关闭Elasticsearch客户端失败: {exc}")
+
 
 def _resolve_upload_dir() -> Path:
     env_dir = os.getenv("CONTRACT_UPLOAD_DIR") or os.getenv("UPLOAD_DIR")
@@ -145,6 +231,48 @@ def _metadata_has_values(metadata: Optional[Dict[str, Any]]) -> bool:
     return False
 
 
+# Elasticsearch 连接与索引存在性的短期缓存：key -> expires_at
+# 只缓存肯定结果；否定结果每次都重新探测，避免新建索引后被误判为不存在
+ES_STATE_TTL_SECONDS = 30.0
+_es_state_cache: Dict[str, float] = {}
+
+
+def _cached_es_check(key: str, probe: Callable[[], bool]) -> bool:
+    now = time.monotonic()
+    expires_at = _es_state_cache.get(key)
+    if expires_at is not None and now < expires_at:
+        return True
+
+    if probe():
+        _es_state_cache[key] = now + ES_STATE_TTL_SECONDS
+        return True
+
+    _es_state_cache.pop(key, None)
+    return False
+
+
+def _es_alive() -> bool:
+    return _cached_es_check("__ping__", es_searcher.es.ping)
+
+
+def _index_exists(index_name: str) -> bool:
+    return _cached_es_check(f"index:{index_name}", lambda: es_searcher.es.indices.exists(index=index_name))
+
+
+def _invalidate_index_exists(index_name: str) -> None:
+    _es_state_cache.pop(f"index:{index_name}", None)
+
+
+@functools.lru_cache(maxsize=4096)
+def _format_mtime_ns(mtime_ns: int) -> Tuple[str, str]:
+    """将文件修改时间（纳秒）格式化为 (ISO-8601 UTC, 本地时间展示字符串)。
+
+    结果只取决于时间戳本身，因此按 st_mtime_ns 缓存即可，无需在文件变化时失效。
+    """
+    upload_dt = datetime.fromtimestamp(mtime_ns / 1_000_000_000, tz=timezone.utc)
+    return upload_dt.isoformat(), upload_dt.astimezone().strftime("%Y-%m-%d %H:%M:%S")
+
+
 def _get_file_info(contract_name: str, preferred_file_name: Optional[str] = None) -> Dict[str, Any]:
     result: Dict[str, Any] = {
         "file_name": preferred_file_name,
@@ -165,8 +293,7 @@ def _get_file_info(contract_name: str, preferred_file_name: Optional[str] = None
     for candidate in candidates:
         if candidate.exists():
             stat_info = candidate.stat()
-            upload_dt = datetime.fromtimestamp(stat_info.st_mtime, tz=timezone.utc)
-            result["upload_time"] = upload_dt.isoformat()
+            result["upload_time"] = _format_mtime_ns(stat_info.st_mtime_ns)[0]
             result["file_name"] = candidate.name
             result["file_size_bytes"] = stat_info.st_size
             break
@@ -174,6 +301,42 @@ def _get_file_info(contract_name: str, preferred_file_name: Optional[str] = None
     return result
 
 
+# 文档列表聚合的桶数量缓存：(size, expires_at)，每个 TTL 周期只做一次 cardinality 查询
+DOCUMENT_BUCKET_SIZE_TTL_SECONDS = 60.0
+_document_bucket_size_cache: Tuple[int, float] = (0, 0.0)
+
+
+def _invalidate_document_bucket_size() -> None:
+    global _document_bucket_size_cache
+    _document_bucket_size_cache = (0, 0.0)
+
+
+def _get_document_bucket_size(index_name: str) -> int:
+    """根据 contractName 的去重数量确定 terms 聚合的桶数量，预留 10% 余量。"""
+    global _document_bucket_size_cache
+
+    size, expires_at = _document_bucket_size_cache
+    now = time.monotonic()
+    if size and now < expires_at:
+        return size
+
+    response = es_searcher.es.search(
+        index=index_name,
+        body={
+            "size": 0,
+            "aggs": {
+                "unique_contracts": {
+                    "cardinality": {"field": "contractName"},
+                }
+            },
+        },
+    )
+    unique_count = response.get('aggregations', {}).get('unique_contracts', {}).get('value') or 0
+    size = max(50, math.ceil(unique_count * 1.1))
+    _document_bucket_size_cache = (size, now + DOCUMENT_BUCKET_SIZE_TTL_SECONDS)
+    return size
+
+
 def _collect_es_document_summaries() -> Dict[str, Dict[str, Any]]:
     summaries: Dict[str, Dict[str, Any]] = {}
 
@@ -188,7 +351,7 @@ def _collect_es_document_summaries() -> Dict[str, Dict[str, Any]]:
                 "documents": {
                     "terms": {
                         "field": "contractName",
-                        "size": 1000,
+                        "size": _get_document_bucket_size(index_name),
                     },
                     "aggs": {
                         "page_count": {
@@ -335,10 +498,13 @@ async def _process_uploaded_file(upload_id: str, file_path: Path) -> None:
             print(f"WARNING: 更新上传状态失败 upload_id={upload_id}, stage={stage}: {exc}")
 
     try:
-        await run_in_threadpool(
-            pdf_to_es.process_file_path,
-            file_path,
-            status_callback=_status_callback,
+        await asyncio.get_running_loop().run_in_executor(
+            PDF_EXECUTOR,
+            functools.partial(
+                pdf_to_es.process_file_path,
+                file_path,
+                status_callback=_status_callback,
+            ),
         )
     except Exception as exc:  # noqa: BLE001
         print(f"ERROR: 处理上传文件失败 upload_id={upload_id}, file={file_path.name}: {exc}")
@@ -346,6 +512,10 @@ async def _process_uploaded_file(upload_id: str, file_path: Path) -> None:
             status_manager.update_upload_record(upload_id, status="failed", error=str(exc))
         except Exception as update_exc:  # noqa: BLE001
             print(f"WARNING: 记录失败状态出错 upload_id={upload_id}: {update_exc}")
+    finally:
+        _invalidate_document_bucket_size()
+        _invalidate_document_detail(file_path.stem)
+        doc_getter.invalidate(file_path.name)
 
 
 @app.get("/document/list")
@@ -410,6 +580,10 @@ async def get_document_list():
         "data": documents,
     }
 
+
+# 兼容别名：GET /documents -> /document/list
+app.add_api_route("/documents", get_document_list, methods=["GET"], include_in_schema=False)
+
 UPLOAD_DIR = _resolve_upload_dir()
 
 
@@ -428,9 +602,9 @@ def _format_file_size(size_in_bytes: int) -> str:
 
 
 @app.get("/")
-async def root():
-    if FRONTEND_INDEX_FILE.exists():
-        return FileResponse(FRONTEND_INDEX_FILE)
+async def root(request: Request):
+    if FRONTEND_INDEX_BYTES is not None:
+        return _frontend_index_response(request)
 
     return {
         "message": "contractsSearchAPI running",
@@ -469,30 +643,29 @@ async def upload_document(
     success_results: List[Dict[str, Union[str, int, None]]] = []
     failed_results: List[Dict[str, Union[str, int]]] = []
 
-    allowed_types = {'application/pdf'}
-    max_file_size = 100 * 1024 * 1024  # 100MB
     UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
     for upload in files:
         filename = upload.filename or "unknown.pdf"
-        normalized_name = Path(filename).name
+        normalized_name = os.path.basename(filename)
         file_path: Optional[Path] = None
 
         try:
-            if upload.content_type not in allowed_types:
+            if upload.content_type not in ALLOWED_UPLOAD_TYPES:
                 raise HTTPException(status_code=400, detail=f"文件 {normalized_name} 类型不支持")
 
             contents = await upload.read()
             if not contents:
                 raise HTTPException(status_code=400, detail=f"文件 {normalized_name} 内容为空")
-            if len(contents) > max_file_size:
+            if len(contents) > MAX_UPLOAD_FILE_SIZE:
                 raise HTTPException(status_code=400, detail=f"文件 {normalized_name} 超过大小限制")
 
             file_path = UPLOAD_DIR / normalized_name
             with open(file_path, "wb") as destination:
                 destination.write(contents)
+            _stat_upload_file.cache_clear()
 
-            contract_name = Path(normalized_name).stem
+            contract_name = normalized_name[:-4] if normalized_name.lower().endswith('.pdf') else normalized_name
             upload_id = status_manager.create_upload_record(
                 file_name=normalized_name,
                 contract_name=contract_name,
@@ -562,12 +735,7 @@ async def upload_document(
 
 
 # 兼容别名：POST /upload -> /document/add
-@app.post("/upload")
-async def upload_alias(
-    upload_password: str = Form(..., alias="upload_password", description="上传文档时的访问密码"),
-    files: List[UploadFile] = File(..., description="上传的PDF合同文件，支持一次选择多个")
-):
-    return await upload_document(upload_password=upload_password, files=files)
+app.add_api_route("/upload", upload_document, methods=["POST"], include_in_schema=False)
 
 
 @app.delete("/document/delete")
@@ -577,6 +745,9 @@ async def delete_by_filename(filename: str = Query(..., description="要删除
     """
     try:
         result = await run_in_threadpool(es_deleter.delete_by_filename, filename)
+        _stat_upload_file.cache_clear()
+        _invalidate_document_detail()
+        doc_getter.invalidate(filename)
 
         if result['status'] == 'success':
             status_removed = 0
@@ -607,8 +778,50 @@ async def delete_by_filename(filename: str = Query(..., description="要删除
             "data": None
         }
 
-@app.get("/document/search")
-async def search_documents(
+class SearchParams(BaseModel):
+    """搜索接口参数，范围与跨字段校验统一交给 pydantic 完成。"""
+
+    query_content: Optional[str] = None
+    query_metadata: Optional[str] = None
+    search_mode: Literal["content", "metadata", "hybrid"] = "content"
+    amount_min: Optional[float] = Field(default=None, ge=0)
+    amount_max: Optional[float] = Field(default=None, ge=0)
+    date_start: Optional[date] = None
+    date_end: Optional[date] = None
+    our_entity: Optional[str] = None
+    customer_category_level1: Optional[List[str]] = None
+    customer_category_level2: Optional[List[str]] = None
+    top_k: int = Field(default=99, ge=1, le=99)
+    text_standard: int = Field(default=3, ge=0)
+    text_ngram: int = Field(default=1, ge=0)
+    vector_weight: float = Field(default=5.0, ge=0, le=10)
+    metadata_weight: float = Field(default=3.0, ge=0, le=10)
+    fuzziness: Literal["AUTO", "0", "1", "2"] = "AUTO"
+
+    @field_validator("customer_category_level1", "customer_category_level2", mode="before")
+    @classmethod
+    def _split_category_param(cls, value: Any) -> Optional[List[str]]:
+        if isinstance(value, str):
+            items = [item.strip() for item in value.split(',') if item and item.strip()]
+            return items or None
+        return value
+
+    @model_validator(mode="after")
+    def _check_cross_fields(self) -> "SearchParams":
+        if self.search_mode == "content" and not self.query_content:
+            raise ValueError("内容搜索模式需要 query_content 参数")
+        if self.search_mode == "metadata" and not self.query_metadata:
+            raise ValueError("元数据搜索模式需要 query_metadata 参数")
+        if self.search_mode == "hybrid" and not self.query_content and not self.query_metadata:
+            raise ValueError("混合搜索模式需要至少一个查询参数")
+        if self.amount_min is not None and self.amount_max is not None and self.amount_min > self.amount_max:
+            raise ValueError("amount_min 不能大于 amount_max")
+        if self.date_start is not None and self.date_end is not None and self.date_start > self.date_end:
+            raise ValueError("date_start 不能晚于 date_end")
+        return self
+
+
+def get_search_params(
         # 兼容旧版本的query参数
         query: Optional[str] = Query(default=None, description="搜索关键词（兼容参数）"),
         # 新版本的分离参数
@@ -630,107 +843,62 @@ async def search_documents(
         vector_weight: Optional[float] = Query(default=5.0, description="向量权重"),
         metadata_weight: Optional[float] = Query(default=3.0, description="元数据权重"),
         fuzziness: Optional[str] = Query(default="AUTO", description="模糊匹配级别")
-):
+) -> SearchParams:
+    """收集查询参数并交给 SearchParams 校验，校验失败时返回 400 与字符串 detail。"""
+    # 处理兼容性：如果使用旧版query参数，则作为内容搜索
+    if query and not query_content and not query_metadata:
+        query_content = query
+        search_mode = "content"
+
+    raw_params = {
+        "query_content": query_content,
+        "query_metadata": query_metadata,
+        "search_mode": search_mode,
+        "amount_min": amount_min,
+        "amount_max": amount_max,
+        "date_start": date_start,
+        "date_end": date_end,
+        "our_entity": our_entity,
+        "customer_category_level1": customer_category_level1,
+        "customer_category_level2": customer_category_level2,
+        "top_k": top_k,
+        "text_standard": text_standard,
+        "text_ngram": text_ngram,
+        "vector_weight": vector_weight,
+        "metadata_weight": metadata_weight,
+        "fuzziness": fuzziness,
+    }
+    try:
+        return SearchParams(**{key: value for key, value in raw_params.items() if value is not None})
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors()) from exc
+
+
+@app.get("/document/search")
+async def search_documents(params: SearchParams = Depends(get_search_params)):
     """
     文档搜索接口（支持混合检索）
     """
     try:
-        # 处理兼容性：如果使用旧版query参数，则作为内容搜索
-        if query and not query_content and not query_metadata:
-            query_content = query
-            search_mode = "content"
-        
-        # 参数校验
-        if search_mode not in ("content", "metadata", "hybrid"):
-            raise HTTPException(status_code=400, detail="search_mode 必须为 content/metadata/hybrid")
-        
-        # 根据搜索模式验证必要参数
-        if search_mode == "content" and not query_content:
-            raise HTTPException(status_code=400, detail="内容搜索模式需要 query_content 参数")
-        elif search_mode == "metadata" and not query_metadata:
-            raise HTTPException(status_code=400, detail="元数据搜索模式需要 query_metadata 参数")
-        elif search_mode == "hybrid" and not query_content and not query_metadata:
-            raise HTTPException(status_code=400, detail="混合搜索模式需要至少一个查询参数")
-
-        try:
-            top_k_val = int(top_k) if top_k is not None else 99
-        except Exception:
-            raise HTTPException(status_code=400, detail="top_k 必须为整数")
-        if top_k_val < 1 or top_k_val > 99:
-            raise HTTPException(status_code=400, detail="top_k 取值范围为 1-99")
-
-        try:
-            ts_val = int(text_standard) if text_standard is not None else 3
-            tn_val = int(text_ngram) if text_ngram is not None else 1
-        except Exception:
-            raise HTTPException(status_code=400, detail="text_standard 与 text_ngram 必须为整数")
-        if ts_val < 0 or tn_val < 0:
-            raise HTTPException(status_code=400, detail="文本权重必须为非负整数")
-
-        try:
-            vw_val = float(vector_weight) if vector_weight is not None else 5.0
-            mw_val = float(metadata_weight) if metadata_weight is not None else 3.0
-        except Exception:
-            raise HTTPException(status_code=400, detail="权重参数必须为数字")
-        if vw_val < 0 or vw_val > 10 or mw_val < 0 or mw_val > 10:
-            raise HTTPException(status_code=400, detail="权重取值范围为 0-10")
-
-        if fuzziness not in ("AUTO", "0", "1", "2"):
-            raise HTTPException(status_code=400, detail="fuzziness 仅支持 AUTO/0/1/2")
-
-        # 验证筛选参数
-        if amount_min is not None and amount_min < 0:
-            raise HTTPException(status_code=400, detail="amount_min 必须为非负数")
-        if amount_max is not None and amount_max < 0:
-            raise HTTPException(status_code=400, detail="amount_max 必须为非负数")
-        if amount_min is not None and amount_max is not None and amount_min > amount_max:
-            raise HTTPException(status_code=400, detail="amount_min 不能大于 amount_max")
-        
-        # 验证日期格式
-        from datetime import datetime
-        if date_start is not None:
-            try:
-                datetime.strptime(date_start, "%Y-%m-%d")
-            except ValueError:
-                raise HTTPException(status_code=400, detail="date_start 格式必须为 YYYY-MM-DD")
-        if date_end is not None:
-            try:
-                datetime.strptime(date_end, "%Y-%m-%d")
-            except ValueError:
-                raise HTTPException(status_code=400, detail="date_end 格式必须为 YYYY-MM-DD")
-        if date_start is not None and date_end is not None and date_start > date_end:
-            raise HTTPException(status_code=400, detail="date_start 不能晚于 date_end")
-
-        def _parse_category_param(value: Optional[str]) -> Optional[List[str]]:
-            if value is None:
-                return None
-            if isinstance(value, str):
-                items = [item.strip() for item in value.split(',') if item and item.strip()]
-                return items or None
-            return None
-
-        category_level1_list = _parse_category_param(customer_category_level1)
-        category_level2_list = _parse_category_param(customer_category_level2)
-
         # 调用新的搜索接口
         results = await run_in_threadpool(
             es_searcher.search,
-            query_content or "",
-            query_metadata=query_metadata or "",
-            search_mode=search_mode,
-            top_k=top_k_val,
-            text_standard=ts_val,
-            text_ngram=tn_val,
-            vector_weight=vw_val,
-            metadata_weight=mw_val,
-            fuzziness=fuzziness,
-            amount_min=amount_min,
-            amount_max=amount_max,
-            date_start=date_start,
-            date_end=date_end,
-            our_entity_filter=our_entity,
-            category_level1_filter=category_level1_list,
-            category_level2_filter=category_level2_list
+            params.query_content or "",
+            query_metadata=params.query_metadata or "",
+            search_mode=params.search_mode,
+            top_k=params.top_k,
+            text_standard=params.text_standard,
+            text_ngram=params.text_ngram,
+            vector_weight=params.vector_weight,
+            metadata_weight=params.metadata_weight,
+            fuzziness=params.fuzziness,
+            amount_min=params.amount_min,
+            amount_max=params.amount_max,
+            date_start=params.date_start.isoformat() if params.date_start else None,
+            date_end=params.date_end.isoformat() if params.date_end else None,
+            our_entity_filter=params.our_entity,
+            category_level1_filter=params.customer_category_level1,
+            category_level2_filter=params.customer_category_level2
         )
 
         return {
@@ -747,49 +915,7 @@ async def search_documents(
 
 
 # 兼容别名：GET /search -> /document/search
-@app.get("/search")
-async def search_alias(
-        # 兼容旧版本的query参数
-        query: Optional[str] = Query(default=None, description="搜索关键词（兼容参数）"),
-        # 新版本的分离参数
-        query_content: Optional[str] = Query(default=None, description="内容搜索关键词"),
-        query_metadata: Optional[str] = Query(default=None, description="元数据搜索关键词"),
-        search_mode: Optional[str] = Query(default="content", description="搜索模式：content/metadata/hybrid"),
-        # 筛选参数
-        amount_min: Optional[float] = Query(default=None, description="合同金额最小值"),
-        amount_max: Optional[float] = Query(default=None, description="合同金额最大值"),
-        date_start: Optional[str] = Query(default=None, description="合同签订开始日期 (YYYY-MM-DD)"),
-        date_end: Optional[str] = Query(default=None, description="合同签订结束日期 (YYYY-MM-DD)"),
-        our_entity: Optional[str] = Query(default=None, description="我方实体名称（中软国际）"),
-        customer_category_level1: Optional[str] = Query(default=None, description="客户分类一级（逗号分隔或多次传参）"),
-        customer_category_level2: Optional[str] = Query(default=None, description="客户分类二级（逗号分隔或多次传参）"),
-        # 其他参数保持不变
-        top_k: Optional[int] = Query(default=99, description="返回结果数量"),
-        text_standard: Optional[int] = Query(default=3, description="标准文本权重"),
-        text_ngram: Optional[int] = Query(default=1, description="N-gram文本权重"),
-        vector_weight: Optional[float] = Query(default=5.0, description="向量权重"),
-        metadata_weight: Optional[float] = Query(default=3.0, description="元数据权重"),
-        fuzziness: Optional[str] = Query(default="AUTO", description="模糊匹配级别")
-):
-    return await search_documents(
-        query=query,
-        query_content=query_content,
-        query_metadata=query_metadata,
-        search_mode=search_mode,
-        amount_min=amount_min,
-        amount_max=amount_max,
-        date_start=date_start,
-        date_end=date_end,
-        our_entity=our_entity,
-        customer_category_level1=customer_category_level1,
-        customer_category_level2=customer_category_level2,
-        top_k=top_k,
-        text_standard=text_standard,
-        text_ngram=text_ngram,
-        vector_weight=vector_weight,
-        metadata_weight=metadata_weight,
-        fuzziness=fuzziness,
-    )
+app.add_api_route("/search", search_documents, methods=["GET"], include_in_schema=False)
 
 
 # 系统信息接口
@@ -800,7 +926,7 @@ async def get_elasticsearch_info():
     """
     try:
         # 获取集群健康状态
-        health = es_searcher.es.cluster.health()
+        health = await run_in_threadpool(es_searcher.es.cluster.health)
 
         return {
             "code": 200,
@@ -821,142 +947,184 @@ async def get_elasticsearch_info():
         }
 
 
-# 兼容别名：GET /documents -> /document/list
-@app.get("/documents")
-async def get_uploaded_documents():
-    """
-    获取已上传的文档列表（兼容接口）
-    """
-    return await get_document_list()
+# 旧版客户端使用的驼峰字段别名，仅在 ?aliases=1 时附加
+DETAIL_CAMEL_ALIASES = {
+    "contract_name": "contractName",
+    "data_type": "dataType",
+    "total_pages": "totalPages",
+    "total_chars": "totalChars",
+    "extraction_status": "extractionStatus",
+    "document_metadata": "structuredData",
+    "metadata_status": "metadataStatus",
+    "upload_time_display": "uploadTime",
+    "file_size": "fileSize",
+    "file_name": "fileName",
+}
+
+
+# 文档详情缓存：contractName -> (detail, expires_at)；保存元数据、删除、重新上传时失效
+DOCUMENT_DETAIL_CACHE_TTL_SECONDS = 60.0
+DOCUMENT_DETAIL_CACHE_MAXSIZE = 2048
+_document_detail_cache: Dict[str, Tuple[Dict[str, Any], float]] = {}
+
+
+def _invalidate_document_detail(contract_name: Optional[str] = None) -> None:
+    # 文档内容或元数据变化后，已缓存的检索结果同样失效
+    es_searcher.result_cache.clear()
+    if contract_name is None:
+        _document_detail_cache.clear()
+    else:
+        _document_detail_cache.pop(contract_name, None)
+
+
+def _build_document_detail(normalized: str) -> Dict[str, Any]:
+    """从 ES 读取指定合同的全部页面并组装详情（不含驼峰别名）"""
+    cached = _document_detail_cache.get(normalized)
+    if cached is not None and time.monotonic() < cached[1]:
+        return cached[0]
+
+    index_name = es_searcher.index_name
+
+    if not _index_exists(index_name):
+        raise HTTPException(status_code=404, detail="索引不存在")
+
+    # 只取详情需要的字段：页面向量与元数据向量不返回
+    query = {
+        "query": {
+            "term": {
+                "contractName": normalized
+            }
+        },
+        "_source": {
+            "includes": ["pageId", "text", "document_metadata"],
+            "excludes": ["document_metadata.metadata_vector"]
+        },
+        "sort": [
+            {"pageId": {"order": "asc"}}
+        ]
+    }
+
+    try:
+        hits = list(helpers.scan(
+            es_searcher.es,
+            index=index_name,
+            query=query,
+            size=200,
+            preserve_order=True
+        ))
+    except es_exceptions.NotFoundError:
+        raise HTTPException(status_code=404, detail="文档不存在")
+
+    if not hits:
+        raise HTTPException(status_code=404, detail="未找到匹配文档")
+
+    pages = []
+    total_chars = 0
+    document_metadata = None
+    metadata_status = "not_extracted"
+    for hit in hits:
+        source = hit.get("_source", {})
+        page_id = source.get("pageId")
+        text = source.get("text") or ""
+        char_count = len(text)
+        total_chars += char_count
+        pages.append({
+            "pageId": page_id,
+            "text": text,
+            "charCount": char_count,
+        })
+
+        # 元数据只存储在第一页，其余页面不再检查
+        if page_id == 1:
+            raw_metadata = source.get("document_metadata")
+            if isinstance(raw_metadata, dict) and raw_metadata:
+                document_metadata = raw_metadata
+
+    file_path = None
+    if UPLOAD_DIR.exists():
+        for pdf_path in UPLOAD_DIR.glob("*.pdf"):
+            if pdf_path.stem == normalized:
+                file_path = pdf_path
+                break
+
+    upload_iso = None
+    upload_display = None
+    file_size = None
+    contract_display_name = normalized
+
+    if file_path and file_path.exists():
+        stat_info = file_path.stat()
+        upload_iso, upload_display = _format_mtime_ns(stat_info.st_mtime_ns)
+        file_size = _format_file_size(stat_info.st_size)
+        contract_display_name = file_path.name
+
+    # 判断是否“已提取”：关键字段至少有一个非空
+    def _is_non_empty(v):
+        return v is not None and v != "" and v != [] and v != {}
+
+    has_metadata_flag = False
+    if isinstance(document_metadata, dict) and document_metadata:
+        key_fields = [
+            'customer_name', 'our_entity', 'customer_category_level1',
+            'customer_category_level2', 'contract_amount',
+            'project_description', 'positions', 'personnel_list'
+        ]
+        has_metadata_flag = any(_is_non_empty(document_metadata.get(k)) for k in key_fields)
+
+    metadata_status = 'extracted' if has_metadata_flag else 'not_extracted'
+
+    detail = {
+        "contract_name": contract_display_name,
+        "data_type": "legacy",
+        "total_pages": len(pages),
+        "total_chars": total_chars,
+        "extraction_status": "已提取" if has_metadata_flag else "未提取",
+        "document_metadata": document_metadata,
+        "metadata_status": metadata_status,
+        "has_metadata": has_metadata_flag,
+        "pages": pages,
+        "upload_time": upload_iso,
+        "upload_time_display": upload_display,
+        "file_size": file_size,
+    }
+
+    if file_path:
+        detail["file_name"] = file_path.name
+
+    if len(_document_detail_cache) >= DOCUMENT_DETAIL_CACHE_MAXSIZE:
+        # 字典按插入顺序迭代，淘汰最早写入的条目
+        _document_detail_cache.pop(next(iter(_document_detail_cache)), None)
+    _document_detail_cache[normalized] = (detail, time.monotonic() + DOCUMENT_DETAIL_CACHE_TTL_SECONDS)
+    return detail
 
 
 @app.get("/documents/{document_name}/detail")
-async def get_document_detail(document_name: str):
+async def get_document_detail(
+    document_name: str,
+    aliases: bool = Query(default=False, description="是否附加旧版驼峰字段别名"),
+):
     """
     获取指定文档的详细信息
     """
     try:
-        index_name = es_searcher.index_name
-
-        if not es_searcher.es.indices.exists(index=index_name):
-            raise HTTPException(status_code=404, detail="索引不存在")
-
         name_only = Path(document_name).name
         normalized = name_only[:-4] if name_only.lower().endswith('.pdf') else name_only
 
-        query = {
-            "query": {
-                "term": {
-                    "contractName": normalized
-                }
-            },
-            "sort": [
-                {"pageId": {"order": "asc"}}
-            ]
-        }
-
-        try:
-            hits = list(helpers.scan(
-                es_searcher.es,
-                index=index_name,
-                query=query,
-                size=200,
-                preserve_order=True
-            ))
-        except es_exceptions.NotFoundError:
-            raise HTTPException(status_code=404, detail="文档不存在")
-
-        if not hits:
-            raise HTTPException(status_code=404, detail="未找到匹配文档")
-
-        pages = []
-        total_chars = 0
-        document_metadata = None
-        metadata_status = "not_extracted"
-        for hit in hits:
-            source = hit.get("_source", {})
-            page_id = source.get("pageId")
-            text = source.get("text") or ""
-            char_count = len(text)
-            total_chars += char_count
-            pages.append({
-                "pageId": page_id,
-                "text": text,
-                "charCount": char_count,
-            })
+        detail = await run_in_threadpool(_build_document_detail, normalized)
 
-            if document_metadata is None:
-                raw_metadata = source.get("document_metadata")
-                if isinstance(raw_metadata, dict) and raw_metadata:
-                    document_metadata = raw_metadata
-
-        file_path = None
-        if UPLOAD_DIR.exists():
-            for pdf_path in UPLOAD_DIR.glob("*.pdf"):
-                if pdf_path.stem == normalized:
-                    file_path = pdf_path
-                    break
-
-        upload_iso = None
-        upload_display = None
-        file_size = None
-        contract_display_name = normalized
-
-        if file_path and file_path.exists():
-            stat_info = file_path.stat()
-            upload_dt = datetime.fromtimestamp(stat_info.st_mtime, tz=timezone.utc)
-            upload_iso = upload_dt.isoformat()
-            upload_display = upload_dt.astimezone().strftime("%Y-%m-%d %H:%M:%S")
-            file_size = _format_file_size(stat_info.st_size)
-            contract_display_name = file_path.name
-
-        # 判断是否“已提取”：关键字段至少有一个非空
-        def _is_non_empty(v):
-            return v is not None and v != "" and v != [] and v != {}
-
-        has_metadata_flag = False
-        if isinstance(document_metadata, dict) and document_metadata:
-            key_fields = [
-                'customer_name', 'our_entity', 'customer_category_level1',
-                'customer_category_level2', 'contract_amount',
-                'project_description', 'positions', 'personnel_list'
-            ]
-            has_metadata_flag = any(_is_non_empty(document_metadata.get(k)) for k in key_fields)
-
-        metadata_status = 'extracted' if has_metadata_flag else 'not_extracted'
-
-        detail = {
-            "contract_name": contract_display_name,
-            "contractName": contract_display_name,
-            "data_type": "legacy",
-            "dataType": "legacy",
-            "total_pages": len(pages),
-            "totalPages": len(pages),
-            "total_chars": total_chars,
-            "totalChars": total_chars,
-            "extractionStatus": "已提取" if has_metadata_flag else "未提取",
-            "structured_data": document_metadata,
-            "structuredData": document_metadata,
-            "document_metadata": document_metadata,
-            "metadata_status": metadata_status,
-            "metadataStatus": metadata_status,
-            "has_metadata": has_metadata_flag,
-            "pages": pages,
-            "upload_time": upload_iso,
-            "uploadTime": upload_display,
-            "file_size": file_size,
-            "fileSize": file_size,
-        }
-
-        if file_path:
-            detail["file_name"] = file_path.name
-            detail["fileName"] = file_path.name
+        if aliases:
+            # 缓存中的 detail 为共享对象，附加别名时复制一份
+            detail = {
+                **detail,
+                **{camel: detail[snake] for snake, camel in DETAIL_CAMEL_ALIASES.items() if snake in detail},
+            }
 
-        return {
+        # detail 只含 ES 返回的原生 JSON 类型，直接交给 orjson 序列化，跳过 jsonable_encoder 的逐层遍历
+        return ORJSONResponse(content={
             "code": 200,
             "message": "获取文档详情成功",
             "data": detail
-        }
+        })
 
     except HTTPException:
         raise
@@ -972,6 +1140,9 @@ async def delete_document(document_name: str):
     """
     try:
         result = await run_in_threadpool(es_deleter.delete_by_filename, document_name)
+        _stat_upload_file.cache_clear()
+        _invalidate_document_detail()
+        doc_getter.invalidate(document_name)
         
         if result['status'] == 'success':
             status_removed = 0
@@ -981,7 +1152,7 @@ async def delete_document(document_name: str):
             except Exception as cleanup_exc:  # noqa: BLE001
                 print(f"WARNING: 删除上传状态记录失败 {document_name}: {cleanup_exc}")
 
-            return {
+            return ORJSONResponse({
                 "success": True,
                 "message": f"文档 {document_name} 已删除",
                 "deleted_chunks": result.get('deleted_count', 0),
@@ -989,19 +1160,19 @@ async def delete_document(document_name: str):
                     **result,
                     "status_records_deleted": status_removed,
                 }
-            }
+            })
         else:
-            return {
+            return ORJSONResponse({
                 "success": False,
                 "message": f"删除文档 {document_name} 失败",
                 "data": result
-            }
+            })
     except Exception as e:
-        return {
+        return ORJSONResponse({
             "success": False,
             "message": f"删除文档失败: {str(e)}",
             "data": None
-        }
+        })
 
 
 # 清空索引接口
@@ -1011,38 +1182,41 @@ async def clear_index():
     清空所有文档索引
     """
     try:
-        # 删除整个索引
-        if es_searcher.es.indices.exists(index=es_searcher.index_name):
-            es_searcher.es.indices.delete(index=es_searcher.index_name)
+        # 删除整个索引（同步 ES 调用放到线程池，避免阻塞事件循环）
+        if await run_in_threadpool(_index_exists, es_searcher.index_name):
+            await run_in_threadpool(es_searcher.es.indices.delete, index=es_searcher.index_name)
+            _invalidate_index_exists(es_searcher.index_name)
+            _invalidate_document_detail()
+            doc_getter.invalidate()
             
             # 重新创建索引（如果需要的话）
             # 这里可以根据需要重新创建索引结构
             
-            return {
+            return ORJSONResponse({
                 "success": True,
                 "message": "索引已清空",
                 "cleared_index": es_searcher.index_name
-            }
+            })
         else:
-            return {
+            return ORJSONResponse({
                 "success": True,
                 "message": "索引不存在，无需清空",
                 "cleared_index": es_searcher.index_name
-            }
+            })
     except Exception as e:
-        return {
+        return ORJSONResponse({
             "success": False,
             "message": f"清空索引失败: {str(e)}",
             "data": None
-        }
+        })
 
 
 # 健康检查接口
 @app.get("/health")
 async def health_check():
     try:
-        health = es_searcher.es.cluster.health()
-        return {
+        health = await run_in_threadpool(es_searcher.es.cluster.health)
+        return ORJSONResponse({
             "code": 200,
             "message": "服务正常",
             "data": {
@@ -1052,7 +1226,7 @@ async def health_check():
                 "active_shards": health.get('active_shards'),
                 "index_name": es_searcher.index_name,
             },
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"服务异常: {str(e)}")
 
@@ -1064,7 +1238,7 @@ async def debug_documents():
     """
     try:
         # 检查Elasticsearch连接
-        if not es_searcher.es.ping():
+        if not _es_alive():
             return {
                 "code": 500,
                 "message": "Elasticsearch连接失败",
@@ -1073,17 +1247,27 @@ async def debug_documents():
         
         # 检查索引是否存在
         index_name = "contracts_unified"
-        if not es_searcher.es.indices.exists(index=index_name):
+        if not _index_exists(index_name):
             return {
                 "code": 200,
                 "message": "索引不存在",
                 "data": []
             }
         
-        # 查询所有文档，包括text和text_vector字段
+        # 查询所有文档；text_vector 不随 _source 返回，只通过脚本字段取其维度
         query = {
             "query": {"match_all": {}},
-            "_source": ["contractName", "pageId", "text", "text_vector"],
+            "_source": {
+                "includes": ["contractName", "pageId", "text"],
+                "excludes": ["text_vector"],
+            },
+            "script_fields": {
+                "vec_len": {
+                    "script": {
+                        "source": "doc['text_vector'].size() == 0 ? 0 : doc['text_vector'].vectorValue.length"
+                    }
+                }
+            },
             "size": 50  # 限制返回数量
         }
         
@@ -1094,26 +1278,33 @@ async def debug_documents():
         
         documents = []
         hits = response.get('hits', {}).get('hits', [])
-        
+
         for hit in hits:
             source = hit.get('_source', {})
+            text = source.get('text') or ''
+            vec_len_values = hit.get('fields', {}).get('vec_len') or [0]
+            text_vector_length = int(vec_len_values[0] or 0)
             doc_info = {
                 "contractName": source.get('contractName'),
                 "pageId": source.get('pageId'),
-                "has_text": bool(source.get('text')),
-                "text_length": len(source.get('text', '')),
-                "has_text_vector": bool(source.get('text_vector')),
-                "text_vector_length": len(source.get('text_vector', [])),
-                "text_preview": source.get('text', '')[:200] + '...' if source.get('text') else None
+                "has_text": bool(text),
+                "text_length": len(text),
+                "has_text_vector": text_vector_length > 0,
+                "text_vector_length": text_vector_length,
+                "text_preview": text[:200] + '...' if text else None
             }
             documents.append(doc_info)
-        
-        return {
-            "code": 200,
-            "message": f"找到 {len(documents)} 个文档",
-            "data": documents
-        }
-        
+
+        # 结果最多 50 条，直接返回响应对象，跳过 jsonable_encoder 对列表的逐项遍历
+        return ORJSONResponse(
+            content={
+                "code": 200,
+                "message": f"找到 {len(documents)} 个文档",
+                "data": documents
+            },
+            status_code=200,
+        )
+
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
@@ -1138,18 +1329,15 @@ async def extract_metadata(filename: str = Query(..., description="要提取元
         if not document_text:
             raise HTTPException(status_code=404, detail="文档不存在或无法获取文档内容")
         
-        # 调用LLM进行元数据提取
-        result, metadata_vector = await run_in_threadpool(
-            metadata_extractor.extract_metadata, 
-            document_text
-        )
+        # 调用LLM进行元数据提取（异步 HTTP，不占用线程池）
+        result, metadata_vector = await metadata_extractor.extract_metadata_async(document_text)
         
         if result['success']:
             # 确保元数据中包含合同名称（使用文件名）
             metadata = result['metadata'].copy()
             metadata['contract_name'] = filename
             
-            return {
+            return ORJSONResponse({
                 "code": 200,
                 "message": "元数据提取成功",
                 "data": {
@@ -1158,9 +1346,9 @@ async def extract_metadata(filename: str = Query(..., description="要提取元
                     "document_length": len(document_text),
                     "raw_response": result.get('raw_response')
                 }
-            }
+            })
         else:
-            return {
+            return ORJSONResponse({
                 "code": 500,
                 "message": f"元数据提取失败: {result['error']}",
                 "data": {
@@ -1168,97 +1356,102 @@ async def extract_metadata(filename: str = Query(..., description="要提取元
                     "error": result['error'],
                     "document_length": len(document_text)
                 }
-            }
+            })
         
     except HTTPException:
         raise
     except Exception as e:
-        return {
+        return ORJSONResponse({
             "code": 500,
             "message": f"元数据提取失败: {str(e)}",
             "data": None
-        }
+        })
+
+
+def _contract_name_from_filename(filename: str) -> str:
+    """从上传文件名得到合同名（去除目录与 .pdf 扩展名）"""
+    name_only = Path(filename).name
+    return name_only[:-4] if name_only.lower().endswith('.pdf') else name_only
+
+
+class MetadataPayload(BaseModel):
+    """前端提交的元数据字段，与统一索引 document_metadata 结构一致"""
+    customer_name: Optional[str] = None
+    our_entity: Optional[str] = None
+    customer_category_level1: Optional[str] = None
+    customer_category_level2: Optional[str] = None
+    contract_type: Optional[str] = None
+    contract_amount: Optional[float] = None
+    signing_date: Optional[str] = None
+    project_description: Optional[str] = None
+    positions: Optional[str] = None
+    personnel_list: Optional[str] = None
+
+
+class SaveMetadataRequest(BaseModel):
+    filename: str = Field(min_length=1)
+    metadata: MetadataPayload
+
+
+def _build_metadata_update(metadata: MetadataPayload, now_iso: str) -> Dict[str, Any]:
+    """按统一索引 document_metadata 字段结构整理前端提交的元数据"""
+    return {**metadata.model_dump(), "extracted_at": now_iso}
 
 
 @app.post("/document/save-metadata")
-async def save_metadata(request: dict):
+async def save_metadata(request: SaveMetadataRequest):
     """
     保存文档元数据到统一索引的document_metadata字段
     """
     try:
-        filename = request.get('filename')
-        metadata = request.get('metadata')
-        
-        if not filename or not metadata:
-            raise HTTPException(status_code=400, detail="缺少必要参数：filename 或 metadata")
+        filename = request.filename
+        metadata = request.metadata
         
         # 获取文件名（去除扩展名）
-        name_only = Path(filename).name
-        contract_name = name_only[:-4] if name_only.lower().endswith('.pdf') else name_only
-        
-        # 查找第一页文档（pageId=1）
-        query = {
-            "query": {
-                "bool": {
-                    "must": [
-                        {"term": {"contractName": contract_name}},
-                        {"term": {"pageId": 1}}
-                    ]
-                }
-            }
-        }
+        contract_name = _contract_name_from_filename(filename)
         
         # 使用统一索引
         index_name = "contracts_unified"
-        
-        # 搜索第一页文档
-        response = es_searcher.es.search(
-            index=index_name,
-            body=query,
-            size=1
-        )
-        
-        hits = response.get('hits', {}).get('hits', [])
-        if not hits:
-            raise HTTPException(status_code=404, detail="未找到对应的文档第一页")
-        
-        doc_id = hits[0]['_id']
-        
+        if not await run_in_threadpool(_index_exists, index_name):
+            raise HTTPException(status_code=404, detail="索引不存在")
+
         # 准备元数据更新
         now_iso = datetime.now(timezone.utc).isoformat()
-        metadata_update = {
-            "customer_name": metadata.get('customer_name'),
-            "our_entity": metadata.get('our_entity'),
-            "customer_category_level1": metadata.get('customer_category_level1'),
-            "customer_category_level2": metadata.get('customer_category_level2'),
-            "contract_type": metadata.get('contract_type'),
-            "contract_amount": metadata.get('contract_amount'),
-            "signing_date": metadata.get('signing_date'),
-            "project_description": metadata.get('project_description'),
-            "positions": metadata.get('positions'),
-            "personnel_list": metadata.get('personnel_list'),
-            "extracted_at": now_iso
-        }
-        
-        # 更新文档的document_metadata字段
-        update_body = {
-            "doc": {
-                "document_metadata": metadata_update,
-                "updated_at": now_iso
-            }
-        }
+        metadata_update = _build_metadata_update(metadata, now_iso)
 
-        # 执行更新
-        es_searcher.es.update(
+        # 在服务端一次完成“定位第一页文档（pageId=1）+ 写入元数据”，避免先查ID再更新的两次往返。
+        # update_by_query 不支持 refresh="wait_for"，这里只刷新本次涉及的分片以保证后续查询可见
+        response = await run_in_threadpool(
+            es_searcher.es.update_by_query,
             index=index_name,
-            id=doc_id,
-            body=update_body
+            body={
+                "query": {
+                    "bool": {
+                        "must": [
+                            {"term": {"contractName": contract_name}},
+                            {"term": {"pageId": 1}}
+                        ]
+                    }
+                },
+                # 与批量保存的局部 doc 更新一致：合并进已有 document_metadata，保留 metadata_vector 等未提交的字段
+                "script": {
+                    "source": (
+                        "if (ctx._source.document_metadata == null) { ctx._source.document_metadata = params.md; } "
+                        "else { ctx._source.document_metadata.putAll(params.md); } "
+                        "ctx._source.updated_at = params.ts"
+                    ),
+                    "lang": "painless",
+                    "params": {"md": metadata_update, "ts": now_iso}
+                }
+            },
+            refresh=True
         )
 
-        # 立即刷新索引，确保后续查询可以拿到最新的提取状态
-        es_searcher.es.indices.refresh(index=index_name)
+        if not response.get('updated'):
+            raise HTTPException(status_code=404, detail="未找到对应的文档第一页")
+        _invalidate_document_detail(contract_name)
         
-        return {
+        return ORJSONResponse({
             "code": 200,
             "message": "元数据保存成功",
             "data": {
@@ -1267,16 +1460,163 @@ async def save_metadata(request: dict):
                 "metadata": metadata_update,
                 "saved_at": metadata_update["extracted_at"]
             }
-        }
+        })
         
     except HTTPException:
         raise
     except Exception as e:
-        return {
+        return ORJSONResponse({
             "code": 500,
             "message": f"元数据保存失败: {str(e)}",
             "data": None
-        }
+        })
+
+
+# 批量保存元数据时 parallel_bulk 的参数
+METADATA_BULK_THREAD_COUNT = min(8, os.cpu_count() or 4)
+METADATA_BULK_CHUNK_SIZE = 500
+METADATA_BULK_MAX_CHUNK_BYTES = 50 * 1024 * 1024
+METADATA_BULK_QUEUE_SIZE = 4
+# 单次批量保存的最大条数
+METADATA_BULK_MAX_ITEMS = 1000
+# 按合同名查找第一页文档时每次查询的合同数，需小于 index.max_result_window（默认 10000）
+METADATA_BULK_LOOKUP_SIZE = 1000
+
+
+class SaveMetadataBulkRequest(BaseModel):
+    # 单条仍在 _bulk_save_metadata 中逐条校验，一条不合法不影响其余条目
+    items: List[Dict[str, Any]] = Field(min_length=1, max_length=METADATA_BULK_MAX_ITEMS)
+
+
+def _bulk_save_metadata(index_name: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """一次查询解析所有第一页文档ID，再通过 parallel_bulk 批量写入元数据"""
+    now_iso = datetime.now(timezone.utc).isoformat()
+
+    # 同一合同重复提交时以最后一条为准
+    pending: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+    failed: List[Dict[str, Any]] = []
+    for item in items:
+        try:
+            payload = SaveMetadataRequest.model_validate(item)
+        except ValidationError as exc:
+            filename = item.get('filename') if isinstance(item, dict) else None
+            failed.append({"filename": filename, "error": f"参数校验失败: {exc.errors()}"})
+            continue
+        contract_name = _contract_name_from_filename(payload.filename)
+        pending[contract_name] = (payload.filename, _build_metadata_update(payload.metadata, now_iso))
+
+    doc_ids: Dict[str, str] = {}
+    contract_names = list(pending)
+    for start in range(0, len(contract_names), METADATA_BULK_LOOKUP_SIZE):
+        names_chunk = contract_names[start:start + METADATA_BULK_LOOKUP_SIZE]
+        response = es_searcher.es.search(
+            index=index_name,
+            body={
+                "query": {
+                    "bool": {
+                        "filter": [
+                            {"terms": {"contractName": names_chunk}},
+                            {"term": {"pageId": 1}}
+                        ]
+                    }
+                },
+                # 只取 _id 与 contractName 的 doc value，不加载 _source，也不统计总命中数
+                "_source": False,
+                "docvalue_fields": ["contractName"],
+                "track_total_hits": False,
+                "size": len(names_chunk)
+            }
+        )
+        for hit in response.get('hits', {}).get('hits', []):
+            name = (hit.get('fields', {}).get('contractName') or [None])[0]
+            if name in pending and name not in doc_ids:
+                doc_ids[name] = hit['_id']
+
+    actions = []
+    action_names: Dict[str, str] = {}
+    for contract_name, (filename, metadata_update) in pending.items():
+        doc_id = doc_ids.get(contract_name)
+        if doc_id is None:
+            failed.append({"filename": filename, "error": "未找到对应的文档第一页"})
+            continue
+        action_names[doc_id] = contract_name
+        actions.append({
+            "_op_type": "update",
+            "_index": index_name,
+            "_id": doc_id,
+            "doc": {
+                "document_metadata": metadata_update,
+                "updated_at": now_iso
+            }
+        })
+
+    saved: List[Dict[str, Any]] = []
+    if actions:
+        for ok, result in helpers.parallel_bulk(
+            es_searcher.es,
+            actions,
+            thread_count=METADATA_BULK_THREAD_COUNT,
+            chunk_size=METADATA_BULK_CHUNK_SIZE,
+            max_chunk_bytes=METADATA_BULK_MAX_CHUNK_BYTES,
+            queue_size=METADATA_BULK_QUEUE_SIZE,
+            raise_on_error=False,
+            refresh="wait_for"
+        ):
+            info = result.get('update', {})
+            contract_name = action_names.get(info.get('_id'))
+            if contract_name is None:
+                failed.append({"filename": None, "error": f"无法对应的批量结果: {info}"})
+                continue
+            filename, metadata_update = pending[contract_name]
+            if ok:
+                _invalidate_document_detail(contract_name)
+                saved.append({
+                    "filename": filename,
+                    "contract_name": contract_name,
+                    "metadata": metadata_update,
+                    "saved_at": now_iso
+                })
+            else:
+                failed.append({"filename": filename, "error": str(info.get('error'))})
+
+    return {"saved": saved, "failed": failed}
+
+
+@app.post("/document/save-metadata/bulk")
+async def save_metadata_bulk(request: SaveMetadataBulkRequest):
+    """
+    批量保存多个文档的元数据，请求体为 {"items": [{"filename": ..., "metadata": {...}}, ...]}
+    """
+    try:
+        index_name = "contracts_unified"
+        if not await run_in_threadpool(_index_exists, index_name):
+            raise HTTPException(status_code=404, detail="索引不存在")
+
+        result = await run_in_threadpool(_bulk_save_metadata, index_name, request.items)
+
+        return ORJSONResponse({
+            "code": 200,
+            "message": f"元数据保存完成：成功 {len(result['saved'])} 个，失败 {len(result['failed'])} 个",
+            "data": result
+        })
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        return ORJSONResponse({
+            "code": 500,
+            "message": f"元数据批量保存失败: {str(e)}",
+            "data": None
+        })
+
+
+@functools.lru_cache(maxsize=1024)
+def _stat_upload_file(document_name: str) -> os.stat_result:
+    """缓存上传目录中文件的 stat 结果；文件不存在时抛出 FileNotFoundError（不缓存）"""
+    stat_result = os.stat(UPLOAD_DIR / document_name)
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise FileNotFoundError(document_name)
+    return stat_result
 
 
 @app.get("/document/download/{document_name}")
@@ -1288,13 +1628,16 @@ async def download_document(document_name: str):
         # 构建文件路径（统一使用全局上传目录）
         file_path = UPLOAD_DIR / document_name
         
-        # 检查文件是否存在
-        if not file_path.exists():
+        # 检查文件是否存在（stat 结果按文件名缓存，上传/删除时失效）
+        try:
+            stat_result = _stat_upload_file(document_name)
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail="文件不存在")
         
-        # 返回文件
+        # 返回文件；传入 stat_result 后 FileResponse 不再在事件循环上重复 stat
         return FileResponse(
-            path=str(file_path),
+            path=file_path,
+            stat_result=stat_result,
             filename=document_name,
             media_type='application/pdf'
         )
@@ -1306,15 +1649,15 @@ async def download_document(document_name: str):
 
 # 前端静态文件服务（可选）
 # 如果前端dist文件存在，则提供静态文件服务
-if FRONTEND_INDEX_FILE.exists():
+if FRONTEND_INDEX_BYTES is not None:
     @app.get("/{full_path:path}", include_in_schema=False)
-    async def serve_frontend_app(full_path: str):
+    async def serve_frontend_app(full_path: str, request: Request):
         target_path = FRONTEND_DIST_PATH / full_path
 
-        if target_path.exists() and target_path.is_file():
+        if target_path.is_file():
             return FileResponse(target_path)
 
-        return FileResponse(FRONTEND_INDEX_FILE)
+        return _frontend_index_response(request)
 
 
 if __name__ == "__main__":
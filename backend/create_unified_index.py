@@ -8,11 +8,15 @@ VECTOR_DIMENSION = 1024
 
 UNIFIED_MAPPING = {
     "settings": {
+        # 放宽刷新间隔，减少写入时的段生成；需要读己之写的请求使用 refresh="wait_for"
+        "refresh_interval": "5s",
         "analysis": {
             "tokenizer": {
+                # ngram 子字段的检索分析器是 standard（中文按单字切分），只有长度与 gram 相同的
+                # 字母/数字词才能命中；取 3-gram 单一长度，词项数约为 2~3-gram 的一半
                 "ngram_tokenizer": {
                     "type": "ngram",
-                    "min_gram": 2,
+                    "min_gram": 3,
                     "max_gram": 3,
                     "token_chars": ["letter", "digit"]
                 }
@@ -34,23 +38,26 @@ UNIFIED_MAPPING = {
             "pageId": {"type": "integer"},
             "text": {
                 "type": "text",
+                # 主字段已使用 standard 分词，不再重复建 text.standard 子字段；
+                # ngram 子字段只用于词项匹配打分，不记录位置信息以缩小倒排索引
                 "fields": {
                     "ngram": {
                         "type": "text",
                         "analyzer": "ngram_analyzer",
-                        "search_analyzer": "standard"
-                    },
-                    "standard": {
-                        "type": "text",
-                        "analyzer": "standard"
+                        "search_analyzer": "standard",
+                        "index_options": "freqs"
                     }
                 },
                 "analyzer": "standard",
-                "search_analyzer": "standard"
+                "search_analyzer": "standard",
+                # 记录词项偏移，unified 高亮器可直接从倒排表取片段，无需对每个命中重新分词
+                "index_options": "offsets"
             },
+            # 页面向量以 int8 存储（写入与查询前经 quantize_to_int8 量化），体积为 float32 的 1/4
             "text_vector": {
                 "type": "dense_vector",
                 "dims": VECTOR_DIMENSION,
+                "element_type": "byte",
                 "index": True,
                 "similarity": "cosine"
             },
@@ -73,11 +80,18 @@ UNIFIED_MAPPING = {
                     "positions": {"type": "text"},
                     "personnel_list": {"type": "text"},
                     "extracted_at": {"type": "date"},
+                    # 元数据向量保持 float32 写入，由 ES 在 HNSW 索引中自动做 int8 标量量化（8.12+）；
+                    # 写入与查询前均归一化为单位向量，使用 dot_product 省去每次打分时的模长计算
                     "metadata_vector": {
                         "type": "dense_vector",
                         "dims": VECTOR_DIMENSION,
                         "index": True,
-                        "similarity": "cosine"
+                        "similarity": "dot_product",
+                        "index_options": {
+                            "type": "int8_hnsw",
+                            "m": 16,
+                            "ef_construction": 100
+                        }
                     }
                 }
             },
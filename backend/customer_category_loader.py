@@ -5,31 +5,41 @@
 """
 from __future__ import annotations
 
+import functools
+import os
+import re
 import threading
+import time
 from pathlib import Path
-from typing import Dict, Optional, Tuple
-import re
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, Optional, Sequence, Tuple
 
 CustomerCategory = Tuple[Optional[str], Optional[str]]
 
-# 预编译空白正则，便于在标准化名称时复用
-_WHITESPACE_PATTERN = re.compile(r"\s+")
+_EMPTY_MAPPING: Mapping[str, CustomerCategory] = MappingProxyType({})
+
+# 删除所有 Unicode 空白字符（含全角空格，码位均不超过 U+3000）的转换表，
+# str.translate 单次遍历即可完成，替代“替换全角空格 + 正则去空白”的多次扫描
+_WHITESPACE_DELETE_TABLE = dict.fromkeys(
+    (codepoint for codepoint in range(0x3001) if chr(codepoint).isspace()),
+    None,
+)
 # 匹配甲乙丙丁方前缀，便于统一客户名称
 _PARTY_PREFIX_PATTERN = re.compile(r"^[甲乙丙丁]方[:：\s]*")
 
 
+@functools.lru_cache(maxsize=4096)
 def normalize_customer_key(value: Optional[str]) -> str:
-    """将客户名称标准化为查找键。"""
+    """将客户名称标准化为查找键（客户名称在各页面间高度重复，结果按输入缓存）。"""
     if not value:
         return ""
 
-    text = str(value).strip()
-    # 去除常见的全角空格，随后统一去掉所有空白
-    text = text.replace("\u3000", " ")
+    # 先去掉甲乙方前缀与首尾括号，再移除所有空白（含全角空格）；
+    # 顺序不能颠倒，否则“甲 方：某公司”这类中间带空白的名称也会被当作前缀去掉
+    text = str(value).strip().replace("\u3000", " ")
     text = _PARTY_PREFIX_PATTERN.sub("", text)
-    text = text.strip("（）()\u3000 ")
-    # 对内部所有空白压缩并移除
-    text = _WHITESPACE_PATTERN.sub("", text)
+    text = text.strip("（）() ")
+    text = text.translate(_WHITESPACE_DELETE_TABLE)
     if not text:
         return ""
     return text.casefold()
@@ -38,10 +48,16 @@ def normalize_customer_key(value: Optional[str]) -> str:
 class CustomerCategoryLookup:
     """Excel 客户分类白名单的缓存查找器。"""
 
+    # 两次检查白名单文件 mtime 的最小间隔（秒），间隔内的查找不触发 stat
+    MTIME_CHECK_INTERVAL_SECONDS = 1.0
+
     def __init__(self, file_path: Optional[str]) -> None:
         self._file_path = Path(file_path).expanduser() if file_path else None
-        self._mapping: Dict[str, CustomerCategory] = {}
+        # 映射加载后冻结为只读视图，只整体替换、不原地修改，
+        # 读者无需加锁即可看到完整的旧表或新表
+        self._mapping: Mapping[str, CustomerCategory] = _EMPTY_MAPPING
         self._file_mtime: Optional[float] = None
+        self._last_check: Optional[float] = None
         self._lock = threading.RLock()
 
     def lookup(self, customer_name: Optional[str]) -> CustomerCategory:
@@ -66,15 +82,31 @@ class CustomerCategoryLookup:
     def _ensure_loaded(self) -> None:
         if not self._file_path:
             return
+
+        # 无锁快速路径：间隔内直接复用当前映射，文件未变化时只做一次 stat
+        now = time.monotonic()
+        last_check = self._last_check
+        if last_check is not None and now - last_check < self.MTIME_CHECK_INTERVAL_SECONDS:
+            return
+        try:
+            mtime: Optional[float] = os.stat(self._file_path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime is not None and mtime == self._file_mtime:
+            self._last_check = now
+            return
+
+        # 文件发生变化（或尚未加载）时才加锁，串行化并发的重新加载
         with self._lock:
             self._load_mapping(force=False)
 
     def _load_mapping(self, force: bool) -> None:
         path = self._file_path
+        self._last_check = time.monotonic()
         if not path.exists():
             if self._mapping:
                 print(f"客户分类白名单文件不存在: {path}")
-                self._mapping.clear()
+                self._mapping = _EMPTY_MAPPING
                 self._file_mtime = None
             return
 
@@ -88,11 +120,39 @@ class CustomerCategoryLookup:
             print(f"加载客户分类白名单失败: {exc}")
             return
 
-        self._mapping = mapping
+        self._mapping = MappingProxyType(mapping)
         self._file_mtime = mtime
+        # 白名单重新加载后清空标准化缓存，避免缓存随旧白名单中的名称无限累积
+        normalize_customer_key.cache_clear()
         print(f"客户分类白名单已加载，共 {len(mapping)} 条记录")
 
     def _read_excel(self, path: Path) -> Dict[str, CustomerCategory]:
+        mapping = self._read_excel_with_calamine(path)
+        if mapping is not None:
+            return mapping
+        return self._read_excel_with_openpyxl(path)
+
+    def _read_excel_with_calamine(self, path: Path) -> Optional[Dict[str, CustomerCategory]]:
+        """优先使用 python-calamine（Rust 实现的流式解析）读取；未安装时返回 None。"""
+        try:
+            from python_calamine import CalamineWorkbook  # type: ignore
+        except ImportError:
+            return None
+
+        workbook = CalamineWorkbook.from_path(str(path))
+        rows = workbook.get_sheet_by_index(0).to_python(skip_empty_area=True)
+        found = CustomerCategoryLookup._find_header_row(rows)
+        if found is None:
+            raise RuntimeError("客户分类白名单为空")
+        header_row_number, header = found
+
+        column_index = self._resolve_column_indices(header)
+        if column_index["customer_name"] is None:
+            raise RuntimeError("客户分类白名单缺少客户名称列")
+
+        return self._build_mapping(rows[header_row_number:], column_index)
+
+    def _read_excel_with_openpyxl(self, path: Path) -> Dict[str, CustomerCategory]:
         try:
             from openpyxl import load_workbook  # type: ignore
         except ImportError as exc:  # pylint: disable=broad-exception-caught
@@ -101,44 +161,64 @@ class CustomerCategoryLookup:
         workbook = load_workbook(path, read_only=True, data_only=True)
         try:
             worksheet = workbook.active
-            rows = worksheet.iter_rows(min_row=1, values_only=True)
-            header = CustomerCategoryLookup._find_header_row(rows)
-            if header is None:
+            # 部分工具导出的表格记录的尺寸信息不准确，只读模式会按错误尺寸扫描大量空单元格；
+            # 重置后按实际存在的行迭代
+            worksheet.reset_dimensions()
+            found = CustomerCategoryLookup._find_header_row(worksheet.iter_rows(values_only=True))
+            if found is None:
                 raise RuntimeError("客户分类白名单为空")
+            header_row_number, header = found
 
             column_index = self._resolve_column_indices(header)
             if column_index["customer_name"] is None:
                 raise RuntimeError("客户分类白名单缺少客户名称列")
 
-            mapping: Dict[str, CustomerCategory] = {}
-            duplicates: Dict[str, CustomerCategory] = {}
-            for row in rows:
-                name = self._get_cell_value(row, column_index["customer_name"])
-                if not name:
-                    continue
+            # 数据行只读取到最后一个需要的列
+            max_col = max(idx for idx in column_index.values() if idx is not None) + 1
+            rows = worksheet.iter_rows(
+                min_row=header_row_number + 1,
+                min_col=1,
+                max_col=max_col,
+                values_only=True,
+            )
+            return self._build_mapping(rows, column_index)
+        finally:
+            workbook.close()
 
-                level1 = self._get_cell_value(row, column_index["level1"])
-                level2 = self._get_cell_value(row, column_index["level2"])
+    def _build_mapping(
+        self,
+        rows: Iterable[Sequence[Optional[object]]],
+        column_index: Dict[str, Optional[int]],
+    ) -> Dict[str, CustomerCategory]:
+        mapping: Dict[str, CustomerCategory] = {}
+        duplicates: Dict[str, CustomerCategory] = {}
+        # 分类组合远少于客户数量，相同的 (一级, 二级) 元组共用同一个对象
+        record_pool: Dict[CustomerCategory, CustomerCategory] = {}
+        for row in rows:
+            name = self._get_cell_value(row, column_index["customer_name"])
+            if not name:
+                continue
 
-                key = normalize_customer_key(name)
-                if not key:
-                    continue
+            level1 = self._get_cell_value(row, column_index["level1"])
+            level2 = self._get_cell_value(row, column_index["level2"])
 
-                record = (level1, level2)
-                if key in mapping and mapping[key] != record:
-                    duplicates[key] = mapping[key]
-                    continue
+            key = normalize_customer_key(name)
+            if not key:
+                continue
 
-                mapping[key] = record
+            record = record_pool.setdefault((level1, level2), (level1, level2))
+            if key in mapping and mapping[key] != record:
+                duplicates[key] = mapping[key]
+                continue
 
-            if duplicates:
-                print(
-                    f"客户分类白名单存在重复客户，已保留首条记录: {', '.join(duplicates.keys())}"
-                )
+            mapping[key] = record
 
-            return mapping
-        finally:
-            workbook.close()
+        if duplicates:
+            print(
+                f"客户分类白名单存在重复客户，已保留首条记录: {', '.join(duplicates.keys())}"
+            )
+
+        return mapping
 
     @staticmethod
     def _resolve_column_indices(header_row: Tuple[Optional[object], ...]) -> Dict[str, Optional[int]]:
@@ -164,22 +244,19 @@ class CustomerCategoryLookup:
     def _normalize_header(value: Optional[str]) -> Optional[str]:
         if value is None:
             return None
-        text = str(value).strip()
-        if not text:
-            return None
-        text = text.replace("\u3000", " ")
-        text = _WHITESPACE_PATTERN.sub("", text)
-        return text
+        text = str(value).translate(_WHITESPACE_DELETE_TABLE)
+        return text or None
 
     @staticmethod
-    def _find_header_row(rows: iter) -> Optional[Tuple[Optional[object], ...]]:
-        for row in rows:
+    def _find_header_row(rows: iter) -> Optional[Tuple[int, Tuple[Optional[object], ...]]]:
+        """返回首个非空行的 (行号, 行内容)，行号从 1 开始。"""
+        for row_number, row in enumerate(rows, start=1):
             if any(CustomerCategoryLookup._normalize_header(cell) for cell in row):
-                return row
+                return row_number, row
         return None
 
     @staticmethod
-    def _get_cell_value(row: Tuple[Optional[object], ...], index: Optional[int]) -> Optional[str]:
+    def _get_cell_value(row: Sequence[Optional[object]], index: Optional[int]) -> Optional[str]:
         if index is None or index >= len(row):
             return None
         value = row[index]
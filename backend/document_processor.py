@@ -1,6 +1,19 @@
+import contextlib
 import logging
+import multiprocessing
+import os
 import re
-from typing import Dict, List
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    import fitz  # type: ignore[import-not-found]  # PyMuPDF，项目已有依赖
+except ImportError:  # pragma: no cover - 缺少PyMuPDF时回退到PyPDF2
+    fitz = None  # type: ignore[assignment]
 
 try:
     import PyPDF2  # type: ignore[import-not-found]
@@ -9,6 +22,128 @@ except ImportError:  # pragma: no cover - 环境缺少PyPDF2时延迟报错
 
 logger = logging.getLogger(__name__)
 
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+# 需要删除的控制字符及 Latin-1 补充字符；其中属于空白的字符（如 \x0b、\x85、\xa0）
+# 不在表内，交由空白正则统一折叠为空格
+_CONTROL_CHAR_DELETE_TABLE = dict.fromkeys(
+    (
+        codepoint
+        for codepoint in (*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20), *range(0x7F, 0x100))
+        if not chr(codepoint).isspace()
+    ),
+    None,
+)
+
+# 页数不少于该阈值时才启用多进程提取，避免小文件承担进程池启动开销
+PARALLEL_EXTRACT_MIN_PAGES = 16
+# 单个子任务提取的页数；按页块分发以摊薄进程间传输开销
+PARALLEL_EXTRACT_BLOCK_PAGES = 8
+PARALLEL_EXTRACT_MAX_WORKERS = 4
+
+# PDF 来源：内存中的字节，或磁盘文件路径（多进程任务只需传递路径）
+PdfSource = Union[bytes, str, Path]
+
+
+# 进程内共享的 PDF 处理进程池，首次使用时创建
+_PDF_PROCESS_POOL: Optional[ProcessPoolExecutor] = None
+_PDF_PROCESS_POOL_LOCK = threading.Lock()
+
+
+def get_pdf_process_pool() -> ProcessPoolExecutor:
+    """返回共享的 PDF 处理进程池
+
+    调用方多在请求或后台工作线程中，fork 多线程进程可能让子进程继承被占用的锁而死锁，
+    因此以 spawn 方式启动子进程；进程池常驻，避免每份文档重复启动解释器并导入 PyMuPDF。
+    """
+    global _PDF_PROCESS_POOL
+    with _PDF_PROCESS_POOL_LOCK:
+        if _PDF_PROCESS_POOL is None:
+            _PDF_PROCESS_POOL = ProcessPoolExecutor(
+                max_workers=min(os.cpu_count() or 1, PARALLEL_EXTRACT_MAX_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _PDF_PROCESS_POOL
+
+
+def reset_pdf_process_pool(pool: ProcessPoolExecutor) -> None:
+    """子进程异常退出导致进程池不可用时丢弃该池，下次使用时重新创建"""
+    global _PDF_PROCESS_POOL
+    with _PDF_PROCESS_POOL_LOCK:
+        if _PDF_PROCESS_POOL is pool:
+            _PDF_PROCESS_POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@contextlib.contextmanager
+def pdf_source_as_path(pdf_source: PdfSource) -> Iterator[PdfSource]:
+    """字节来源先写入临时文件，多进程任务只需传递路径，不必为每个页块重复序列化整份 PDF"""
+    if isinstance(pdf_source, (str, Path)):
+        yield pdf_source
+        return
+    fd, tmp_name = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(pdf_source)
+        yield tmp_name
+    finally:
+        os.unlink(tmp_name)
+
+
+def _plain_page_text(page: Any) -> str:
+    """默认的单页文本提取方式"""
+    return page.get_text("text")
+
+
+def _open_pdf_source(pdf_source: PdfSource) -> Any:
+    """路径交给 PyMuPDF 直接读取文件，字节则按内存流打开"""
+    if isinstance(pdf_source, (str, Path)):
+        return fitz.open(str(pdf_source), filetype="pdf")
+    return fitz.open(stream=pdf_source, filetype="pdf")
+
+
+def _extract_page_range(
+    pdf_source: PdfSource, start: int, stop: int, page_text: Callable[[Any], str]
+) -> List[str]:
+    """子进程任务：独立打开 PDF，提取 [start, stop) 页的文本，每页一个元素"""
+    with _open_pdf_source(pdf_source) as document:
+        return [page_text(document.load_page(index)) for index in range(start, stop)]
+
+
+def iter_pdf_page_texts(
+    pdf_source: PdfSource, page_text: Callable[[Any], str] = _plain_page_text
+) -> Iterator[str]:
+    """使用 PyMuPDF 按页序逐页产出文本；页数较多时按页块分发到多个进程并行提取
+
+    page_text 为单页提取函数，须定义在模块顶层以便传给子进程。
+    """
+    with _open_pdf_source(pdf_source) as document:
+        page_count = document.page_count
+        if page_count < PARALLEL_EXTRACT_MIN_PAGES:
+            for index in range(page_count):
+                yield page_text(document.load_page(index))
+            return
+
+    block = PARALLEL_EXTRACT_BLOCK_PAGES
+    bounds = [(start, min(start + block, page_count)) for start in range(0, page_count, block)]
+    workers = min(os.cpu_count() or 1, PARALLEL_EXTRACT_MAX_WORKERS, len(bounds))
+    executor = get_pdf_process_pool()
+    with pdf_source_as_path(pdf_source) as pdf_path:
+        try:
+            # 每波只提交 workers 个页块，消费完再提交下一波；map 按提交顺序返回结果，无需再排序
+            for wave_start in range(0, len(bounds), workers):
+                wave = bounds[wave_start:wave_start + workers]
+                for page_texts in executor.map(
+                    _extract_page_range,
+                    [pdf_path] * len(wave),
+                    [start for start, _ in wave],
+                    [stop for _, stop in wave],
+                    [page_text] * len(wave),
+                ):
+                    yield from page_texts
+        except BrokenProcessPool:
+            reset_pdf_process_pool(executor)
+            raise
+
 
 class DocumentProcessor:
     """文档处理器，用于处理PDF文档并分块"""
@@ -21,38 +156,42 @@ class DocumentProcessor:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
 
-    def process_document(self, file_path: str, filename: str) -> List[Dict]:
-        """处理文档并返回分块结果"""
+    def process_document(self, file_path: str, filename: str) -> Iterator[Dict]:
+        """处理文档并逐块产出分块结果；需要列表的调用方自行 list(...)
+
+        PDF 按页提取、按页清理后直接送入滑动窗口，内存中只保留当前页与未满的块，
+        不再构造整份文档的文本及其清理副本。
+        """
         try:
-            text = self._extract_pdf_text(file_path)
-            cleaned_text = self._clean_text(text)
-            chunks = self._split_text_into_chunks(
-                cleaned_text,
-                self.chunk_size,
-                self.chunk_overlap,
-            )
+            pages = (self._clean_text(page_text) for page_text in self._iter_pdf_pages(file_path))
+            chunks = self._iter_chunks_from_pages(pages, self.chunk_size, self.chunk_overlap)
 
-            document_chunks: List[Dict[str, object]] = []
+            chunk_count = 0
             for i, chunk in enumerate(chunks):
-                document_chunks.append(
-                    {
-                        "content": chunk,
-                        "filename": filename,
-                        "chunk_id": i,
-                        "page_number": i + 1,  # 简化的页码处理
-                    }
-                )
+                chunk_count += 1
+                yield {
+                    "content": chunk,
+                    "filename": filename,
+                    "chunk_id": i,
+                    "page_number": i + 1,  # 简化的页码处理
+                }
 
-            logger.info("文档 %s 处理完成，共生成 %d 个块", filename, len(document_chunks))
-            return document_chunks
+            logger.info("文档 %s 处理完成，共生成 %d 个块", filename, chunk_count)
 
         except Exception as exc:  # noqa: BLE001 - 记录并重新抛出具体异常
             logger.error("处理文档 %s 时出错: %s", filename, str(exc))
             raise
 
-    def _extract_pdf_text(self, file_path: str) -> str:
-        """从PDF文件中提取文本"""
-        text = ""
+    def _iter_pdf_pages(self, file_path: str) -> Iterator[str]:
+        """按页序逐页产出PDF文本，优先使用 PyMuPDF（C 实现），不可用时回退到 PyPDF2"""
+        if fitz is not None:
+            try:
+                yield from iter_pdf_page_texts(file_path)
+            except Exception as exc:  # noqa: BLE001 - 记录并重新抛出具体异常
+                logger.error("PDF文本提取失败: %s", str(exc))
+                raise
+            return
+
         try:
             if PyPDF2 is None:
                 raise ImportError(
@@ -61,17 +200,15 @@ class DocumentProcessor:
             with open(file_path, "rb") as file:
                 pdf_reader = PyPDF2.PdfReader(file)
                 for page in pdf_reader.pages:
-                    text += (page.extract_text() or "") + "\n"
+                    yield page.extract_text() or ""
         except Exception as exc:  # noqa: BLE001 - 记录并重新抛出具体异常
             logger.error("PDF文本提取失败: %s", str(exc))
             raise
-        return text
 
     def _clean_text(self, text: str) -> str:
-        """清理文本，移除多余的空白字符"""
-        text = re.sub(r"\s+", " ", text)
-        text = re.sub(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\xff]", "", text)
-        return text.strip()
+        """清理文本，移除控制字符并把连续空白折叠为单个空格"""
+        text = text.translate(_CONTROL_CHAR_DELETE_TABLE)
+        return _WHITESPACE_PATTERN.sub(" ", text).strip()
 
     def _split_text_into_chunks(
         self,
@@ -89,17 +226,61 @@ class DocumentProcessor:
             raise ValueError("chunk_overlap must be zero or a positive integer")
 
         step = max(1, chunk_size - chunk_overlap)
-        chunks: List[str] = []
         text_length = len(text)
         start = 0
 
+        # 先按下标计算每个块去除首尾空白后的范围，最后只做一次切片，避免先切片再 strip 的二次复制
+        ranges: List[Tuple[int, int]] = []
         while start < text_length:
             end = start + chunk_size
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
+            chunk_start, chunk_end = start, min(end, text_length)
+            while chunk_start < chunk_end and text[chunk_start].isspace():
+                chunk_start += 1
+            while chunk_end > chunk_start and text[chunk_end - 1].isspace():
+                chunk_end -= 1
+            if chunk_end > chunk_start:
+                ranges.append((chunk_start, chunk_end))
             if end >= text_length:
                 break
             start += step
 
-        return chunks
+        return [text[chunk_start:chunk_end] for chunk_start, chunk_end in ranges]
+
+    def _iter_chunks_from_pages(
+        self,
+        pages: Iterable[str],
+        chunk_size: int,
+        chunk_overlap: int,
+    ) -> Iterator[str]:
+        """对逐页清理后的文本做流式滑动窗口分块
+
+        页与页之间以单个空格相连，结果与先拼接全文、整体清理后再调用
+        _split_text_into_chunks 完全一致。
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive integer")
+        if chunk_overlap < 0:
+            raise ValueError("chunk_overlap must be zero or a positive integer")
+
+        step = max(1, chunk_size - chunk_overlap)
+        # buffer 始终从当前窗口起点开始
+        buffer = ""
+        for page_text in pages:
+            if not page_text:
+                continue
+            buffer = f"{buffer} {page_text}" if buffer else page_text
+            # 窗口之后仍有文本，说明当前块不是最后一块，可以立即产出
+            while len(buffer) > chunk_size:
+                chunk = buffer[:chunk_size].strip()
+                if chunk:
+                    yield chunk
+                buffer = buffer[step:]
+
+        # 全部页面读取完毕，剩余文本按原逻辑切出最后的块
+        while buffer:
+            chunk = buffer[:chunk_size].strip()
+            if chunk:
+                yield chunk
+            if chunk_size >= len(buffer):
+                break
+            buffer = buffer[step:]
@@ -1,6 +1,7 @@
-from elasticsearch import Elasticsearch
 from pathlib import Path
 
+from es_client import get_es_client
+
 class ElasticsearchDocumentDeleter:
     def __init__(
         self,
@@ -14,7 +15,7 @@ class ElasticsearchDocumentDeleter:
         :param index_name: 索引名称
         """
         try:
-            self.es = Elasticsearch(es_host)
+            self.es = get_es_client(es_host)
             self.index_name = index_name
             # 统一上传目录到项目根的 uploaded_contracts
             self.upload_dir = Path(__file__).resolve().parent.parent / "uploaded_contracts"
@@ -1,9 +1,9 @@
 import json
 from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
+from elasticsearch.helpers import parallel_bulk
 import os
 
-es = Elasticsearch("http://localhost:9200")
+es = Elasticsearch("http://localhost:9200", http_compress=True)
 
 index_name = "contracts"
 file_path = r"D:\Cyc\MyWork\testFiles\output_llm\output_paddleocr\CIR500000220516017-银华基金信息系统技术开发服务合同-2022外包-银华基金管理股份有限公司-3263400-完整版.json"
@@ -12,7 +12,7 @@ contract_name = os.path.basename(file_path).replace('.json', '')
 with open(file_path, "r", encoding="utf-8") as f:
     pages = json.load(f)
 
-actions = [
+actions = (
     {
         "_index": index_name,
         "_source": {
@@ -22,6 +22,14 @@ actions = [
         }
     }
     for page in pages
-]
+)
 
-bulk(es, actions)
+for ok, response in parallel_bulk(
+    es,
+    actions,
+    chunk_size=200,
+    max_chunk_bytes=5 * 1024 * 1024,
+    thread_count=4,
+):
+    if not ok:
+        print(f"写入失败: {response}")
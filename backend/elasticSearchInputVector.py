@@ -1,12 +1,13 @@
 import json
 import os
 from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
+from elasticsearch.helpers import parallel_bulk
 
-from embedding_client import RemoteEmbeddingClient
+from embedding_client import RemoteEmbeddingClient, quantize_to_int8
+from es_client import OrjsonSerializer
 
 # 初始化 ES
-es = Elasticsearch("http://localhost:9200")
+es = Elasticsearch("http://localhost:9200", http_compress=True, serializer=OrjsonSerializer())
 index_name = "contracts_unified"
 
 # 初始化远程向量服务
@@ -20,24 +21,39 @@ contract_name = "sample_contract"
 with open(file_path, "r", encoding="utf-8") as f:
     pages = json.load(f)
 
-# 逐页构建 actions（含向量）
-actions = []
-for page in pages:
-    text = page["text"]
-    vector_results = embedding_client.embed(text)
-    if not vector_results:
-        raise RuntimeError("远程向量服务返回空结果")
-    vector = vector_results[0]  # 向量转换并转为 list（ES 要求）
-
-    actions.append({
-        "_index": index_name,
-        "_source": {
-            "contractName": contract_name,
-            "pageId": page["pageId"],
-            "text": text,
-            "text_vector": vector  # 加入向量字段
+# 按批请求向量服务，每批一次往返
+EMBED_BATCH_SIZE = 32
+texts = [page["text"] for page in pages]
+vectors = []
+for start in range(0, len(texts), EMBED_BATCH_SIZE):
+    batch = texts[start:start + EMBED_BATCH_SIZE]
+    vector_results = embedding_client.embed(batch)
+    if len(vector_results) != len(batch):
+        raise RuntimeError("远程向量服务返回结果数量与请求不一致")
+    vectors.extend(vector_results)
+
+# 逐页生成 actions（含向量），由 parallel_bulk 按需消费，不预先缓存整个列表
+def generate_actions():
+    for page, text, vector_result in zip(pages, texts, vectors):
+        vector = quantize_to_int8(vector_result)  # int8 数组，由 OrjsonSerializer 直接序列化
+
+        yield {
+            "_index": index_name,
+            "_source": {
+                "contractName": contract_name,
+                "pageId": page["pageId"],
+                "text": text,
+                "text_vector": vector  # 加入向量字段
+            }
         }
-    })
 
-# 批量写入 ES
-bulk(es, actions)
+# 分块并行批量写入 ES，单个请求不超过 5MB
+for ok, response in parallel_bulk(
+    es,
+    generate_actions(),
+    chunk_size=200,
+    max_chunk_bytes=5 * 1024 * 1024,
+    thread_count=4,
+):
+    if not ok:
+        print(f"写入失败: {response}")
@@ -1,11 +1,29 @@
-from elasticsearch import Elasticsearch
+import threading
+import time
+from collections import OrderedDict
 from elasticsearch import helpers
 from pathlib import Path
 
+from es_client import get_es_client
+
 class get_document_by_filename:
+    # 正文缓存：同一文档被重复提取元数据时不再重新扫描全部页面
+    TEXT_CACHE_MAXSIZE = 64
+    TEXT_CACHE_TTL_SECONDS = 300.0
+
     def __init__(self, es_host="http://localhost:9200", index_name="contracts_unified"):
-        self.es = Elasticsearch(es_host)
+        self.es = get_es_client(es_host)
         self.index_name = index_name
+        self._text_cache = OrderedDict()  # normalized_filename -> (full_text, expires_at)
+        self._text_cache_lock = threading.Lock()
+
+    def invalidate(self, filename=None):
+        """文档重新上传或删除后调用；不传文件名时清空全部缓存"""
+        with self._text_cache_lock:
+            if filename is None:
+                self._text_cache.clear()
+            else:
+                self._text_cache.pop(self._normalize_filename(filename), None)
     
     def _normalize_filename(self, filename: str) -> str:
         """仅移除常见的 .pdf 扩展名，保留名称中的其他符号"""
@@ -23,50 +41,61 @@ class get_document_by_filename:
         根据文件名从Elasticsearch获取完整的文档文本内容
         """
         try:
+            # 规范化文件名
+            normalized_filename = self._normalize_filename(filename)
+            print(f"原始文件名: {filename}, 规范化后: {normalized_filename}")
+
+            with self._text_cache_lock:
+                cached = self._text_cache.get(normalized_filename)
+                if cached is not None and time.monotonic() < cached[1]:
+                    self._text_cache.move_to_end(normalized_filename)
+                    return cached[0]
+
             # 检查索引是否存在
             if not self.es.indices.exists(index=self.index_name):
                 print(f"索引 {self.index_name} 不存在")
                 return None
             
-            # 规范化文件名
-            normalized_filename = self._normalize_filename(filename)
-            print(f"原始文件名: {filename}, 规范化后: {normalized_filename}")
-            
-            # 构建查询，根据contractName字段匹配文件名
-            # 使用match查询而不是term查询，以更好地处理中文字符
+            # 构建查询，根据contractName字段精确匹配文件名
+            # contractName 为 keyword 字段，filter 中的 term 查询直接查词典且不计算评分
             query = {
                 "query": {
-                    "match": {
-                        "contractName": normalized_filename
+                    "bool": {
+                        "filter": [
+                            {"term": {"contractName": normalized_filename}}
+                        ]
                     }
                 },
-                "sort": [
-                    {"pageId": {"order": "asc"}}
-                ],
                 "_source": ["text", "pageId"]
             }
             
-            # 使用scan获取所有匹配的文档
-            hits = list(helpers.scan(
-                self.es,
-                index=self.index_name,
-                query=query,
-                size=200,
-                preserve_order=True
-            ))
+            # 使用scan获取所有匹配的文档，只保留 (pageId, text)，不持有完整的 hit 字典
+            pages = [
+                (hit["_source"].get("pageId", 0), hit["_source"].get("text"))
+                for hit in helpers.scan(
+                    self.es,
+                    index=self.index_name,
+                    query=query,
+                    size=1000
+                )
+            ]
             
-            if not hits:
+            if not pages:
                 return None
             
-            # 按页面顺序拼接所有文本内容
-            full_text = ""
-            for hit in hits:
-                source = hit.get("_source", {})
-                text = source.get("text", "")
-                if text:
-                    full_text += text + "\n"
+            # 不使用preserve_order，避免ES按pageId排序滚动；页数不多，在本地排序
+            pages.sort(key=lambda page: page[0])
             
-            return full_text.strip()
+            # 按页面顺序一次性拼接所有文本内容
+            full_text = "\n".join(text for _, text in pages if text).strip()
+
+            with self._text_cache_lock:
+                self._text_cache[normalized_filename] = (full_text, time.monotonic() + self.TEXT_CACHE_TTL_SECONDS)
+                self._text_cache.move_to_end(normalized_filename)
+                while len(self._text_cache) > self.TEXT_CACHE_MAXSIZE:
+                    self._text_cache.popitem(last=False)
+
+            return full_text
             
         except Exception as e:
             print(f"获取文档文本失败: {str(e)}")
@@ -83,7 +112,7 @@ class get_document_by_filename:
 #     "multi_match": {
 #       "query": query,
 #       "type": "best_fields",
-#       "fields": ["text.standard^3", "text.ngram"],
+#       "fields": ["text^3", "text.ngram"],
 #       "operator": "or",
 #       "fuzziness": "AUTO"
 #     }
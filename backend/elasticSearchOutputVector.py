@@ -1,9 +1,7 @@
-from elasticsearch import Elasticsearch
-import numpy as np
+from embedding_client import RemoteEmbeddingClient, quantize_to_int8
+from es_client import get_es_client
 
-from embedding_client import RemoteEmbeddingClient
-
-es = Elasticsearch("http://localhost:9200")
+es = get_es_client("http://localhost:9200")
 index_name = "contracts_unified"
 query_text = "银华基金管理股份有限公司"
 
@@ -12,41 +10,31 @@ embedding_client = RemoteEmbeddingClient(model="bge-m3")
 vector_results = embedding_client.embed(query_text)
 if not vector_results:
     raise RuntimeError("远程向量服务返回空结果")
-query_vector = vector_results[0]  # 转为列表格式，方便JSON序列化
+query_vector = quantize_to_int8(vector_results[0])  # int8 数组，由共享客户端直接序列化
 
+# 向量部分走 text_vector 的 HNSW 索引做近似 kNN，不再对每个匹配文档执行 Painless 余弦脚本；
+# knn 与 query 同时给出时，两部分得分按各自 boost 相加（文本分数 + 向量分数）
 body = {
     "size": 3,
+    "knn": {
+        "field": "text_vector",
+        "query_vector": query_vector,
+        "k": 10,
+        "num_candidates": 100,
+        "boost": 5  # 你可以调节向量权重
+    },
     "query": {
-        "function_score": {
-            "query": {
-                "multi_match": {
-                    "query": query_text,
-                    "type": "best_fields",
-                    "fields": ["text.standard^3", "text.ngram"],
-                    "operator": "or",
-                    "fuzziness": "AUTO"
-                }
-            },
-            "boost_mode": "sum",  # 文本分数和向量分数相加
-            "functions": [
-                {
-                    "script_score": {
-                        "script": {
-                            "source": "cosineSimilarity(params.query_vector, 'text_vector') + 1.0",
-                            "params": {
-                                "query_vector": query_vector
-                            }
-                        }
-                    },
-                    "weight": 5  # 你可以调节向量权重
-                }
-            ]
+        "multi_match": {
+            "query": query_text,
+            "type": "best_fields",
+            "fields": ["text^3", "text.ngram"],
+            "operator": "or",
+            "fuzziness": "AUTO"
         }
     },
     "highlight": {
         "fields": {
-            "text.standard": {},
-            "text.ngram": {}
+            "text": {}
         }
     }
 }
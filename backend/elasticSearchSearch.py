@@ -1,8 +1,130 @@
+import functools
+import heapq
 import json
-from typing import List, Dict, Any, Optional
-from elasticsearch import Elasticsearch
+import operator
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import List, Dict, Any, Hashable, Optional, Sequence, Tuple
 
-from embedding_client import RemoteEmbeddingClient
+import numpy as np
+from elasticsearch import helpers
+
+from embedding_client import RemoteEmbeddingClient, get_embedding_client, normalize_l2, quantize_to_int8
+from es_client import get_es_client
+
+
+# 查询向量缓存条数；bge-m3 向量 1024 维，每条约 8KB
+QUERY_EMBEDDING_CACHE_SIZE = 2048
+# 索引文档块时每次请求向量服务的文本条数
+EMBED_BATCH_SIZE = 32
+# kNN 检索时每个分片的候选数量相对 k 的倍数
+KNN_NUM_CANDIDATES_FACTOR = 10
+# 混合检索 RRF 融合的排名平滑常数
+RRF_RANK_CONSTANT = 60
+# 语义结果缓存复用已有结果所需的最小余弦相似度，可通过环境变量 SEMANTIC_CACHE_THRESHOLD 调整
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.99"))
+# 检索请求的公共参数：固定 preference 使相同请求路由到相同的分片副本，
+# 配合 request_cache 让重复的检索（含 size > 0）命中分片级请求缓存
+SEARCH_REQUEST_OPTIONS = {"preference": "contract-search", "request_cache": True}
+
+# 请求体中与查询内容无关的静态部分：模块加载时构建一次，各请求直接引用（只读，不得原地修改）
+_CONTENT_SOURCE = ["contractName", "pageId", "text"]
+_CONTENT_HIGHLIGHT = {
+    "fields": {
+        # 高亮字段不应包含权重或脚本字段，这里固定对原始 text 字段高亮
+        "text": {}
+    }
+}
+_METADATA_SOURCE = {
+    "includes": ["contractName", "pageId", "text", "document_metadata"],
+    "excludes": ["document_metadata.metadata_vector"]
+}
+_METADATA_HIGHLIGHT = {
+    "fields": {
+        "document_metadata.customer_name": {},
+        "document_metadata.our_entity": {},
+        "document_metadata.project_description": {},
+        "document_metadata.customer_category_level1": {},
+        "document_metadata.customer_category_level2": {},
+        "document_metadata.positions": {},
+        "document_metadata.personnel_list": {}
+    }
+}
+
+
+@functools.lru_cache(maxsize=64)
+def _content_text_fields(text_standard: Any, text_ngram: Any) -> Tuple[str, ...]:
+    """构建检索字段（支持标准字段与 ngram 子字段的权重），同一组权重只拼接一次"""
+    text_fields: List[str] = []
+    if isinstance(text_standard, (int, float)) and text_standard > 0:
+        # 使用主字段 text 作为标准检索字段
+        text_fields.append(f"text^{int(text_standard)}")
+    if isinstance(text_ngram, (int, float)) and text_ngram > 0:
+        # 使用 text.ngram 作为 ngram 检索字段
+        text_fields.append(f"text.ngram^{int(text_ngram)}")
+    # 兜底：若未提供有效权重，至少检索主字段
+    if not text_fields:
+        text_fields = ["text^1"]
+    return tuple(text_fields)
+
+
+@functools.lru_cache(maxsize=64)
+def _metadata_fields(metadata_weight: float) -> Tuple[str, ...]:
+    """构建元数据字段搜索，同一权重只拼接一次"""
+    return (
+        f"document_metadata.customer_name^{metadata_weight}",
+        f"document_metadata.our_entity^{metadata_weight}",
+        f"document_metadata.project_description^{metadata_weight * 0.8}",
+        f"document_metadata.customer_category_level1^{metadata_weight * 0.7}",
+        f"document_metadata.customer_category_level2^{metadata_weight * 0.7}",
+        f"document_metadata.positions^{metadata_weight * 0.6}",
+        f"document_metadata.personnel_list^{metadata_weight * 0.6}"
+    )
+
+
+class SemanticResultCache:
+    """近似查询的结果缓存
+
+    保存最近 N 次查询的单位化查询向量及其结果，新查询与同参数下某条缓存的余弦相似度
+    超过阈值时直接复用结果，跳过 ES 检索与结果后处理。超出容量时按先进先出淘汰。
+    结果中含有按查询文本生成的高亮与 BM25 排序，调用方须把标准化后的查询文本放进 key，
+    向量相似度只作为同一文本的二次校验。
+    """
+
+    def __init__(
+            self,
+            capacity: int = 512,
+            threshold: float = SEMANTIC_CACHE_THRESHOLD,
+            ttl_seconds: float = 60.0,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        # (key, unit_vector, results, expires_at)
+        self._entries: deque = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def lookup(self, key: Hashable, vector: np.ndarray) -> Optional[List[Dict[str, Any]]]:
+        now = time.monotonic()
+        with self._lock:
+            candidates = [entry for entry in self._entries if entry[0] == key and entry[3] > now]
+        if not candidates:
+            return None
+        # 所有向量均已单位化，一次矩阵乘法即得全部余弦相似度
+        scores = np.stack([entry[1] for entry in candidates]) @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return list(candidates[best][2])
+
+    def store(self, key: Hashable, vector: np.ndarray, results: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries.append((key, vector, list(results), time.monotonic() + self.ttl_seconds))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
 
 
 class ElasticsearchVectorSearch:
@@ -21,9 +143,14 @@ class ElasticsearchVectorSearch:
         """
         self.embedding_client: Optional[RemoteEmbeddingClient] = None
         try:
-            self.es = Elasticsearch(es_host)
-            self.embedding_client = RemoteEmbeddingClient(model=model_name)
+            self.es = get_es_client(es_host)
+            self.embedding_client = get_embedding_client(model_name)
             self.index_name = index_name
+            # 查询向量按实例做 LRU 缓存，不同模型的实例互不共享：text -> vector
+            self._query_embedding_cache: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+            self._query_embedding_lock = threading.Lock()
+            # 索引内容变化（上传、删除、保存元数据）时由调用方 clear()
+            self.result_cache = SemanticResultCache()
 
             # 检查连接
             if not self.es.ping():
@@ -41,6 +168,118 @@ class ElasticsearchVectorSearch:
             raise ValueError("Remote embedding service returned empty result")
         return vector_results[0]
 
+    def _encode_texts(self, texts: List[str]) -> List[List[float]]:
+        """一次请求批量获取多段文本的向量"""
+        if not self.embedding_client:
+            raise RuntimeError("向量服务未初始化")
+
+        vector_results = self.embedding_client.embed(texts)
+        if len(vector_results) != len(texts):
+            raise ValueError("Remote embedding service returned mismatched result count")
+        return vector_results
+
+    @staticmethod
+    def _knn_clause(
+            field: str,
+            query_vector: Sequence[float],
+            top_k: int,
+            weight: float,
+            filter_clauses: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        构建 dense_vector 字段的近似 kNN 子句（走 HNSW 索引，不再逐文档执行 Painless 余弦脚本）
+
+        cosine 相似度的 kNN 得分为 (1 + cos) / 2，boost 取 2 倍权重，
+        使向量部分得分与原 script_score 的 (cos + 1) * weight 一致。
+        """
+        clause: Dict[str, Any] = {
+            "field": field,
+            "query_vector": query_vector,
+            "k": top_k,
+            "num_candidates": min(top_k * KNN_NUM_CANDIDATES_FACTOR, 10000),
+            "boost": weight * 2
+        }
+        if filter_clauses:
+            clause["filter"] = filter_clauses
+        return clause
+
+    @staticmethod
+    def _build_filters(
+            amount_min: float = None,
+            amount_max: float = None,
+            date_start: str = None,
+            date_end: str = None
+    ) -> List[Dict[str, Any]]:
+        """
+        构建金额、签订日期的范围筛选条件
+
+        同一字段的上下界合并为一个 range 子句；筛选条件放在 bool 的 filter 上下文中，
+        不参与打分，ES 会缓存其文档集合，重复的日期/金额区间查询可直接复用。
+        """
+        filter_clauses = []
+        amount_range = {}
+        if amount_min is not None:
+            amount_range["gte"] = amount_min
+        if amount_max is not None:
+            amount_range["lte"] = amount_max
+        if amount_range:
+            filter_clauses.append({"range": {"document_metadata.contract_amount": amount_range}})
+        date_range = {}
+        if date_start is not None:
+            date_range["gte"] = date_start
+        if date_end is not None:
+            date_range["lte"] = date_end
+        if date_range:
+            filter_clauses.append({"range": {"document_metadata.signing_date": date_range}})
+        return filter_clauses
+
+    def _encode_queries(self, texts: List[str]) -> List[Tuple[float, ...]]:
+        """
+        批量获取查询文本的向量
+
+        命中缓存的文本不再请求向量服务，其余文本合并为一次请求（混合检索的两段查询只需一次往返）。
+        """
+        cache = self._query_embedding_cache
+        found: Dict[str, Tuple[float, ...]] = {}
+        with self._query_embedding_lock:
+            for text in texts:
+                vector = cache.get(text)
+                if vector is not None:
+                    cache.move_to_end(text)
+                    found[text] = vector
+
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if missing:
+            vectors = [tuple(vector) for vector in self._encode_texts(missing)]
+            with self._query_embedding_lock:
+                for text, vector in zip(missing, vectors):
+                    cache[text] = vector
+                    cache.move_to_end(text)
+                    found[text] = vector
+                while len(cache) > QUERY_EMBEDDING_CACHE_SIZE:
+                    cache.popitem(last=False)
+
+        return [found[text] for text in texts]
+
+    def _encode_query(self, text: str) -> List[float]:
+        """查询文本的向量（重复查询直接命中缓存，不再请求向量服务）"""
+        return list(self._encode_queries([text])[0])
+
+    def _query_signature(self, texts: List[Optional[str]]) -> Optional[np.ndarray]:
+        """各查询文本的单位向量拼接后再单位化；拼接向量的余弦相似度即各部分相似度的平均值"""
+        present = [text for text in texts if text]
+        if not present:
+            return None
+        parts = []
+        for raw_vector in self._encode_queries(present):
+            vector = np.asarray(raw_vector, dtype=np.float32)
+            norm = float(np.linalg.norm(vector))
+            if norm == 0.0:
+                return None
+            parts.append(vector / norm)
+        signature = np.concatenate(parts)
+        return signature / np.float32(np.sqrt(len(parts)))
+
     def search(
             self,
             query_text: str = None,
@@ -77,8 +316,42 @@ class ElasticsearchVectorSearch:
         Returns:
             搜索结果列表
         """
+        # 语义结果缓存：检索参数与标准化后的查询文本完全相同、查询向量足够接近时直接返回已有结果；
+        # 高亮片段与关键词排序依赖查询文本本身，不能跨不同文本复用
+        if search_mode == "content":
+            signature_texts = [query_text]
+        elif search_mode == "metadata":
+            signature_texts = [query_metadata]
+        else:
+            signature_texts = [query_text, query_metadata]
+        cache_key = (
+            search_mode,
+            tuple(" ".join((text or "").split()).casefold() for text in signature_texts),
+            top_k,
+            text_standard,
+            text_ngram,
+            vector_weight,
+            metadata_weight,
+            fuzziness,
+            amount_min,
+            amount_max,
+            date_start,
+            date_end,
+            our_entity_filter,
+            tuple(category_level1_filter or ()),
+            tuple(category_level2_filter or ()),
+        )
+        try:
+            signature = self._query_signature(signature_texts)
+        except Exception:  # noqa: BLE001 - 向量服务异常时跳过缓存，交由各检索分支处理
+            signature = None
+        if signature is not None:
+            cached_results = self.result_cache.lookup(cache_key, signature)
+            if cached_results is not None:
+                return cached_results
+
         if search_mode == "content":
-            return self._search_content(
+            results = self._search_content(
                 query_text,
                 top_k,
                 text_standard,
@@ -94,7 +367,7 @@ class ElasticsearchVectorSearch:
                 category_level2_filter,
             )
         elif search_mode == "metadata":
-            return self._search_metadata(
+            results = self._search_metadata(
                 query_metadata,
                 top_k,
                 metadata_weight,
@@ -108,7 +381,7 @@ class ElasticsearchVectorSearch:
                 category_level2_filter,
             )
         elif search_mode == "hybrid":
-            return self._search_hybrid(
+            results = self._search_hybrid(
                 query_text,
                 query_metadata,
                 top_k,
@@ -127,6 +400,11 @@ class ElasticsearchVectorSearch:
             )
         else:
             raise ValueError(f"不支持的搜索模式: {search_mode}")
+
+        # 检索出错时各分支返回空列表，不缓存
+        if signature is not None and results:
+            self.result_cache.store(cache_key, signature, results)
+        return results
     
     def _search_content(
             self,
@@ -147,33 +425,66 @@ class ElasticsearchVectorSearch:
         """
         内容搜索（原有逻辑）
         """
-        if not query_text:
+        body = self._build_content_body(
+            query_text,
+            top_k,
+            text_standard,
+            text_ngram,
+            vector_weight,
+            fuzziness,
+            amount_min,
+            amount_max,
+            date_start,
+            date_end,
+            our_entity_filter,
+            category_level1_filter,
+            category_level2_filter,
+        )
+        if body is None:
             return []
-        # 构建检索字段（支持标准字段与 ngram 子字段的权重）
-        text_fields: List[str] = []
-        if isinstance(text_standard, (int, float)) and text_standard > 0:
-            # 使用主字段 text 作为标准检索字段
-            text_fields.append(f"text^{int(text_standard)}")
-        if isinstance(text_ngram, (int, float)) and text_ngram > 0:
-            # 使用 text.ngram 作为 ngram 检索字段
-            text_fields.append(f"text.ngram^{int(text_ngram)}")
-        # 兜底：若未提供有效权重，至少检索主字段
-        if not text_fields:
-            text_fields = ["text^1"]
-
-        # 生成查询向量
-        query_vector = self._encode_text(query_text)
+
+        # 执行搜索
+        try:
+            results = self.es.search(index=self.index_name, body=body, **SEARCH_REQUEST_OPTIONS)
+            processed_results = self._process_results(results)
+            return self._attach_metadata_info(
+                processed_results,
+                our_entity_filter,
+                category_level1_filter,
+                category_level2_filter,
+            )
+        except Exception as e:
+            print(f"搜索错误: {str(e)}")
+            return []
+    
+    def _build_content_body(
+            self,
+            query_text: str,
+            top_k: int = 3,
+            text_standard: int = 3,
+            text_ngram: int = 1,
+            vector_weight: float = 5.0,
+            fuzziness: str = "AUTO",
+            amount_min: float = None,
+            amount_max: float = None,
+            date_start: str = None,
+            date_end: str = None,
+            our_entity_filter: Optional[str] = None,
+            category_level1_filter: Optional[List[str]] = None,
+            category_level2_filter: Optional[List[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        构建内容搜索请求体，查询文本为空时返回 None
+        """
+        if not query_text:
+            return None
+        text_fields = _content_text_fields(text_standard, text_ngram)
+
+        # 生成查询向量（text_vector 为 int8 字段，查询向量同样量化）
+        query_vector = quantize_to_int8(self._encode_query(query_text))
 
         # 构建筛选条件
-        filter_clauses = []
-        if amount_min is not None:
-            filter_clauses.append({"range": {"document_metadata.contract_amount": {"gte": amount_min}}})
-        if amount_max is not None:
-            filter_clauses.append({"range": {"document_metadata.contract_amount": {"lte": amount_max}}})
-        if date_start is not None:
-            filter_clauses.append({"range": {"document_metadata.signing_date": {"gte": date_start}}})
-        if date_end is not None:
-            filter_clauses.append({"range": {"document_metadata.signing_date": {"lte": date_end}}})
+        filter_clauses = self._build_filters(amount_min, amount_max, date_start, date_end)
 
         # 构建查询部分
         query_part = {
@@ -195,40 +506,57 @@ class ElasticsearchVectorSearch:
                 }
             }
 
-        # 构建搜索体
+        # 构建搜索体：文本查询与 kNN 同时给出时，两部分得分相加
         body = {
             "size": top_k,
-            "query": {
-                "function_score": {
-                    "query": query_part,
-                    "boost_mode": "sum",
-                    "functions": [
-                        {
-                            "script_score": {
-                                "script": {
-                                    "source": "cosineSimilarity(params.query_vector, 'text_vector') + 1.0",
-                                    "params": {
-                                        "query_vector": query_vector
-                                    }
-                                }
-                            },
-                            "weight": vector_weight
-                        }
-                    ]
-                }
-            },
-            "highlight": {
-                "fields": {
-                    # 高亮字段不应包含权重或脚本字段，这里固定对原始 text 字段高亮
-                    "text": {}
-                }
-            }
+            # 只取前 top_k 条，不需要精确统计总命中数
+            "track_total_hits": False,
+            "query": query_part,
+            "knn": self._knn_clause("text_vector", query_vector, top_k, vector_weight, filter_clauses),
+            # 只返回结果处理需要的字段，不回传 text_vector 等向量
+            "_source": _CONTENT_SOURCE,
+            "highlight": _CONTENT_HIGHLIGHT
         }
 
+        return body
+    
+    def _search_metadata(
+            self,
+            query_metadata: str,
+            top_k: int = 3,
+            metadata_weight: float = 3.0,
+            fuzziness: str = "AUTO",
+            amount_min: float = None,
+            amount_max: float = None,
+            date_start: str = None,
+            date_end: str = None,
+            our_entity_filter: Optional[str] = None,
+            category_level1_filter: Optional[List[str]] = None,
+            category_level2_filter: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        元数据搜索
+        """
+        body = self._build_metadata_body(
+            query_metadata,
+            top_k,
+            metadata_weight,
+            fuzziness,
+            amount_min,
+            amount_max,
+            date_start,
+            date_end,
+            our_entity_filter,
+            category_level1_filter,
+            category_level2_filter,
+        )
+        if body is None:
+            return []
+
         # 执行搜索
         try:
-            results = self.es.search(index=self.index_name, body=body)
-            processed_results = self._process_results(results)
+            results = self.es.search(index=self.index_name, body=body, **SEARCH_REQUEST_OPTIONS)
+            processed_results = self._process_metadata_results(results)
             return self._attach_metadata_info(
                 processed_results,
                 our_entity_filter,
@@ -236,10 +564,10 @@ class ElasticsearchVectorSearch:
                 category_level2_filter,
             )
         except Exception as e:
-            print(f"搜索错误: {str(e)}")
+            print(f"元数据搜索错误: {str(e)}")
             return []
     
-    def _search_metadata(
+    def _build_metadata_body(
             self,
             query_metadata: str,
             top_k: int = 3,
@@ -252,37 +580,20 @@ class ElasticsearchVectorSearch:
             our_entity_filter: Optional[str] = None,
             category_level1_filter: Optional[List[str]] = None,
             category_level2_filter: Optional[List[str]] = None
-    ) -> List[Dict[str, Any]]:
+    ) -> Optional[Dict[str, Any]]:
         """
-        元数据搜索
+        构建元数据搜索请求体，查询文本为空时返回 None
         """
         if not query_metadata:
-            return []
+            return None
         
-        # 生成查询向量
-        query_vector = self._encode_text(query_metadata)
+        # 生成查询向量（metadata_vector 使用 dot_product 相似度，查询向量同样归一化）
+        query_vector = normalize_l2(self._encode_query(query_metadata))
         
-        # 构建元数据字段搜索
-        metadata_fields = [
-            f"document_metadata.customer_name^{metadata_weight}",
-            f"document_metadata.our_entity^{metadata_weight}",
-            f"document_metadata.project_description^{metadata_weight * 0.8}",
-            f"document_metadata.customer_category_level1^{metadata_weight * 0.7}",
-            f"document_metadata.customer_category_level2^{metadata_weight * 0.7}",
-            f"document_metadata.positions^{metadata_weight * 0.6}",
-            f"document_metadata.personnel_list^{metadata_weight * 0.6}"
-        ]
+        metadata_fields = _metadata_fields(metadata_weight)
         
         # 构建筛选条件
-        filter_clauses = []
-        if amount_min is not None:
-            filter_clauses.append({"range": {"document_metadata.contract_amount": {"gte": amount_min}}})
-        if amount_max is not None:
-            filter_clauses.append({"range": {"document_metadata.contract_amount": {"lte": amount_max}}})
-        if date_start is not None:
-            filter_clauses.append({"range": {"document_metadata.signing_date": {"gte": date_start}}})
-        if date_end is not None:
-            filter_clauses.append({"range": {"document_metadata.signing_date": {"lte": date_end}}})
+        filter_clauses = self._build_filters(amount_min, amount_max, date_start, date_end)
         if category_level1_filter:
             filter_clauses.append({
                 "terms": {
@@ -321,60 +632,28 @@ class ElasticsearchVectorSearch:
         if filter_clauses:
             query_part["bool"]["filter"] = filter_clauses
         
-        # 构建搜索体
+        # 构建搜索体：kNN 同样只在第一页（含元数据）中检索
+        knn_filter = [{"term": {"pageId": 1}}] + filter_clauses
         body = {
             "size": top_k,
-            "query": {
-                "function_score": {
-                    "query": query_part,
-                    "boost_mode": "sum",
-                    "functions": [
-                        {
-                            "script_score": {
-                                "script": {
-                                    "source": """
-                                        if (doc['document_metadata.metadata_vector'].size() > 0) {
-                                            return cosineSimilarity(params.query_vector, 'document_metadata.metadata_vector') + 1.0;
-                                        } else {
-                                            return 1.0;
-                                        }
-                                    """,
-                                    "params": {
-                                        "query_vector": query_vector
-                                    }
-                                }
-                            },
-                            "weight": metadata_weight
-                        }
-                    ]
-                }
-            },
-            "highlight": {
-                "fields": {
-                    "document_metadata.customer_name": {},
-                    "document_metadata.our_entity": {},
-                    "document_metadata.project_description": {},
-                    "document_metadata.customer_category_level1": {},
-                    "document_metadata.customer_category_level2": {},
-                    "document_metadata.positions": {},
-                    "document_metadata.personnel_list": {}
-                }
-            }
+            # 只取前 top_k 条，不需要精确统计总命中数
+            "track_total_hits": False,
+            "query": query_part,
+            # 只返回结果处理需要的字段，排除元数据向量
+            "_source": _METADATA_SOURCE,
+            "highlight": _METADATA_HIGHLIGHT
         }
-        
-        # 执行搜索
-        try:
-            results = self.es.search(index=self.index_name, body=body)
-            processed_results = self._process_metadata_results(results)
-            return self._attach_metadata_info(
-                processed_results,
-                our_entity_filter,
-                category_level1_filter,
-                category_level2_filter,
+        # 零向量无法归一化，此时只做文本检索
+        if query_vector is not None:
+            body["knn"] = self._knn_clause(
+                "document_metadata.metadata_vector",
+                query_vector,
+                top_k,
+                metadata_weight,
+                knn_filter,
             )
-        except Exception as e:
-            print(f"元数据搜索错误: {str(e)}")
-            return []
+        
+        return body
     
     def _search_hybrid(
             self,
@@ -399,57 +678,102 @@ class ElasticsearchVectorSearch:
         """
         content_results = []
         metadata_results = []
-        
-        # 执行内容搜索
-        if query_text:
-            content_results = self._search_content(
-                query_text,
-                top_k * 2,
-                text_standard,
-                text_ngram,
-                vector_weight,
-                fuzziness,
-                amount_min,
-                amount_max,
-                date_start,
-                date_end,
-                our_entity_filter,
-                category_level1_filter,
-                category_level2_filter,
-            )
-        
-        # 执行元数据搜索
-        if query_metadata:
-            metadata_results = self._search_metadata(
-                query_metadata,
-                top_k * 2,
-                metadata_weight,
-                fuzziness,
-                amount_min,
-                amount_max,
-                date_start,
-                date_end,
-                our_entity_filter,
-                category_level1_filter,
-                category_level2_filter,
-            )
+
+        content_body = self._build_content_body(
+            query_text,
+            top_k * 2,
+            text_standard,
+            text_ngram,
+            vector_weight,
+            fuzziness,
+            amount_min,
+            amount_max,
+            date_start,
+            date_end,
+            our_entity_filter,
+            category_level1_filter,
+            category_level2_filter,
+        )
+        metadata_body = self._build_metadata_body(
+            query_metadata,
+            top_k * 2,
+            metadata_weight,
+            fuzziness,
+            amount_min,
+            amount_max,
+            date_start,
+            date_end,
+            our_entity_filter,
+            category_level1_filter,
+            category_level2_filter,
+        )
+
+        # 内容搜索与元数据搜索通过一次 msearch 请求发送
+        searches = []
+        processors = []
+        if content_body is not None:
+            searches.extend([{"index": self.index_name, **SEARCH_REQUEST_OPTIONS}, content_body])
+            processors.append(("content", self._process_results))
+        if metadata_body is not None:
+            searches.extend([{"index": self.index_name, **SEARCH_REQUEST_OPTIONS}, metadata_body])
+            processors.append(("metadata", self._process_metadata_results))
+
+        if searches:
+            try:
+                responses = self.es.msearch(searches=searches)["responses"]
+            except Exception as e:
+                print(f"混合搜索错误: {str(e)}")
+                responses = []
+
+            for (kind, processor), response in zip(processors, responses):
+                # 单个子查询失败时只影响该部分结果
+                if "error" in response:
+                    print(f"混合搜索中{'内容' if kind == 'content' else '元数据'}查询错误: {response['error']}")
+                    continue
+                try:
+                    processed_results = self._attach_metadata_info(
+                        processor(response),
+                        our_entity_filter,
+                        category_level1_filter,
+                        category_level2_filter,
+                    )
+                except Exception as e:
+                    print(f"处理混合搜索结果错误: {str(e)}")
+                    continue
+                if kind == "content":
+                    content_results = processed_results
+                else:
+                    metadata_results = processed_results
 
         # 合并和重新排序结果
-        return self._merge_results(content_results, metadata_results, top_k)
+        return self._merge_results(
+            content_results,
+            metadata_results,
+            top_k,
+            our_entity_filter,
+            category_level1_filter,
+            category_level2_filter,
+        )
     
     def _merge_results(
             self,
             content_results: List[Dict[str, Any]],
             metadata_results: List[Dict[str, Any]],
-            top_k: int
+            top_k: int,
+            our_entity_filter: Optional[str] = None,
+            category_level1_filter: Optional[List[str]] = None,
+            category_level2_filter: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
         """
         合并内容搜索和元数据搜索结果
+
+        两路得分量纲不同，排序采用倒数排名融合（RRF）：合同在每一路中的排名 r
+        贡献 1 / (RRF_RANK_CONSTANT + r)，与得分绝对值无关。combined_score 仍保留两路得分之和。
         """
         # 使用合同名称作为键来合并结果
         merged_dict = {}
         
-        # 处理内容搜索结果
+        # 处理内容搜索结果（按合同首次出现的顺序计算排名）
         for result in content_results:
             contract_name = result['contract_name']
             if contract_name not in merged_dict:
@@ -458,6 +782,7 @@ class ElasticsearchVectorSearch:
                     'content_score': result['score'],
                     'metadata_score': 0,
                     'combined_score': result['score'],
+                    'rrf_score': 1.0 / (RRF_RANK_CONSTANT + len(merged_dict) + 1),
                     'content_pages': [],
                     'metadata_info': None,
                     'highlights': result.get('highlights', {})
@@ -470,14 +795,16 @@ class ElasticsearchVectorSearch:
             })
         
         # 处理元数据搜索结果
-        for result in metadata_results:
+        for rank, result in enumerate(metadata_results, start=1):
             contract_name = result['contract_name']
+            rrf_contribution = 1.0 / (RRF_RANK_CONSTANT + rank)
             if contract_name not in merged_dict:
                 merged_dict[contract_name] = {
                     'contract_name': contract_name,
                     'content_score': 0,
                     'metadata_score': result['score'],
                     'combined_score': result['score'],
+                    'rrf_score': rrf_contribution,
                     'content_pages': [],
                     'metadata_info': result.get('metadata_info'),
                     'highlights': result.get('highlights', {})
@@ -485,18 +812,17 @@ class ElasticsearchVectorSearch:
             else:
                 merged_dict[contract_name]['metadata_score'] = result['score']
                 merged_dict[contract_name]['combined_score'] += result['score']
+                merged_dict[contract_name]['rrf_score'] += rrf_contribution
                 merged_dict[contract_name]['metadata_info'] = result.get('metadata_info')
                 # 合并高亮信息
                 merged_dict[contract_name]['highlights'].update(result.get('highlights', {}))
         
-        # 按综合得分排序并返回前top_k个结果
-        sorted_results = sorted(
+        # 按 RRF 得分取前top_k个结果，同分时按综合得分（堆选择，O(n log k)，无需对全部结果排序）
+        enriched_results = heapq.nlargest(
+            top_k,
             merged_dict.values(),
-            key=lambda x: x['combined_score'],
-            reverse=True
+            key=operator.itemgetter('rrf_score', 'combined_score')
         )
-        
-        enriched_results = sorted_results[:top_k]
         return self._attach_metadata_info(
             enriched_results,
             our_entity_filter,
@@ -529,26 +855,31 @@ class ElasticsearchVectorSearch:
         :param chunks: 文档块列表
         :param filename: 文件名
         """
+        def _actions():
+            # 按批生成文档向量，每批一次请求，边生成边交给 bulk 写入
+            for start in range(0, len(chunks), EMBED_BATCH_SIZE):
+                batch = chunks[start:start + EMBED_BATCH_SIZE]
+                vectors = self._encode_texts([chunk['content'] for chunk in batch])
+                for chunk, vector in zip(batch, vectors):
+                    yield {
+                        "_op_type": "index",
+                        "_index": self.index_name,
+                        "_id": f"{filename}_{chunk['chunk_id']}",
+                        "_source": {
+                            "contractName": filename,
+                            "pageId": chunk['page_number'],
+                            "text": chunk['content'],
+                            "text_vector": quantize_to_int8(vector)
+                        }
+                    }
+
         try:
-            for chunk in chunks:
-                # 生成文档向量
-                text_vector = self._encode_text(chunk['content'])
-                
-                # 构建文档
-                doc = {
-                    "contractName": filename,
-                    "pageId": chunk['page_number'],
-                    "text": chunk['content'],
-                    "text_vector": text_vector
-                }
-                
-                # 索引文档
-                doc_id = f"{filename}_{chunk['chunk_id']}"
-                self.es.index(
-                    index=self.index_name,
-                    id=doc_id,
-                    body=doc
-                )
+            # 通过 bulk 批量写入，每 500 个块一次请求，替代逐块 index
+            helpers.bulk(
+                self.es.options(request_timeout=60),
+                _actions(),
+                chunk_size=500,
+            )
             
             # 刷新索引
             self.es.indices.refresh(index=self.index_name)
@@ -722,7 +1053,11 @@ class ElasticsearchVectorSearch:
             try:
                 query = {
                     "size": 1,
-                    "_source": ["document_metadata"],
+                    "track_total_hits": False,
+                    "_source": {
+                        "includes": ["document_metadata"],
+                        "excludes": ["document_metadata.metadata_vector"]
+                    },
                     "query": {
                         "bool": {
                             "must": [
@@ -743,7 +1078,7 @@ class ElasticsearchVectorSearch:
                     }
                 }
 
-                response = self.es.search(index=self.index_name, body=query)
+                response = self.es.search(index=self.index_name, body=query, **SEARCH_REQUEST_OPTIONS)
                 hits = response.get('hits', {}).get('hits', [])
                 if not hits:
                     continue
@@ -62,7 +62,13 @@ es.indices.create(
                     "type": "dense_vector",
                     "dims": 1024,  # bge-m3 输出 1024 维向量
                     "index": True,
-                    "similarity": "cosine"  # 也可以是 l2_norm、dot_product，根据模型向量特性来选
+                    "similarity": "cosine",  # 也可以是 l2_norm、dot_product，根据模型向量特性来选
+                    # HNSW 图中的向量由 ES 自动量化为 int8（8.12+），内存约为 float32 的 1/4
+                    "index_options": {
+                        "type": "int8_hnsw",
+                        "m": 16,
+                        "ef_construction": 100
+                    }
                 }
             }
         }
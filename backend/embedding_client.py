@@ -2,21 +2,126 @@
 
 from __future__ import annotations
 
+import hashlib
 import os
-from typing import Iterable, List, Sequence, Union
+import sqlite3
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Union
 
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def quantize_to_int8(vector: Sequence[float]) -> np.ndarray:
+    """Scale a float embedding into [-127, 127] integers for byte dense_vector fields.
+
+    Cosine similarity ignores vector length, so each vector is scaled by its own
+    max magnitude; only rounding error is introduced. The int8 array is returned
+    as-is: the shared ES client serializes numpy arrays directly, so no list of
+    boxed Python ints is built.
+    """
+    values = np.asarray(vector, dtype=np.float32)
+    peak = float(np.abs(values).max()) if values.size else 0.0
+    if peak == 0.0:
+        return np.zeros(values.size, dtype=np.int8)
+    return np.rint(values * (127.0 / peak)).astype(np.int8)
+
+
+def normalize_l2(vector: Sequence[float]) -> np.ndarray | None:
+    """Return the vector scaled to unit length as float32, or None for a zero vector.
+
+    Fields mapped with dot_product similarity require unit-length vectors on both
+    the indexing and the query side.
+    """
+    values = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(values))
+    if norm == 0.0:
+        return None
+    return values / np.float32(norm)
+
+
+DEFAULT_EMBEDDING_CACHE_PATH = Path(__file__).resolve().parent / ".cache" / "remote_embeddings.sqlite3"
+
+
+class EmbeddingDiskCache:
+    """SQLite-backed store of embeddings keyed by sha256(model + text).
+
+    Survives process restarts, so re-indexing the same pages or repeating a query
+    after a restart does not hit the remote service again.
+    """
+
+    # Stay below SQLite's default limit on bound parameters per statement.
+    _QUERY_BATCH_SIZE = 500
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for start in range(0, len(keys), self._QUERY_BATCH_SIZE):
+                batch = keys[start:start + self._QUERY_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def set_many(self, items: Dict[str, Sequence[float]]) -> None:
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes())
+            for key, vector in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows
+            )
+            self._conn.commit()
+
+
+def _open_default_cache() -> Optional[EmbeddingDiskCache]:
+    """Open the cache named by CONTRACT_EMBEDDING_CACHE ("off" disables it)."""
+    setting = os.getenv("CONTRACT_EMBEDDING_CACHE")
+    if setting is not None and setting.strip().lower() in ("", "0", "off", "false", "none"):
+        return None
+    try:
+        return EmbeddingDiskCache(setting or DEFAULT_EMBEDDING_CACHE_PATH)
+    except (OSError, sqlite3.Error) as exc:
+        print(f"Embedding disk cache unavailable, continuing without it: {exc}")
+        return None
 
 
 class RemoteEmbeddingClient:
     """Small wrapper to fetch embeddings from the remote bge-m3 service."""
 
+    # Inputs per HTTP request when a call has to be split.
+    REQUEST_BATCH_SIZE = 32
+
     def __init__(
         self,
         api_key: str | None = None,
         model: str = "bge-m3",
         endpoint: str | None = None,
         timeout: float = 30.0,
+        cache: EmbeddingDiskCache | None = None,
     ) -> None:
         # Keep the same API key source as metadata extraction.
         self.api_key = api_key or os.getenv("CONTRACT_API_KEY") or os.getenv("DEEPSEEK_API_KEY")
@@ -27,6 +132,27 @@ class RemoteEmbeddingClient:
         self.endpoint = endpoint or os.getenv("CONTRACT_EMBEDDING_URL") or "http://model.aicc.chinasoftinc.com/v1/embeddings"
         self.model = model
         self.timeout = timeout
+        self.session = self._build_session()
+        self.cache = cache if cache is not None else _open_default_cache()
+
+    @staticmethod
+    def _build_session() -> requests.Session:
+        """Keep-alive session so consecutive calls reuse pooled TCP/TLS connections.
+
+        Embedding requests are idempotent, so POSTs are retried on connection
+        errors and transient 429/5xx responses with a short backoff.
+        """
+        retry = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset({"POST"}),
+        )
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=50, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
 
     def embed(self, texts: Union[str, Sequence[str]]) -> List[List[float]]:
         if isinstance(texts, str):
@@ -36,6 +162,56 @@ class RemoteEmbeddingClient:
         if not payload_inputs:
             return []
 
+        if self.cache is None:
+            return self._request_embeddings(payload_inputs)
+
+        # Only texts missing from the disk cache are sent, in one batched request.
+        keys = [EmbeddingDiskCache.make_key(self.model, text) for text in payload_inputs]
+        try:
+            cached = self.cache.get_many(keys)
+        except sqlite3.Error as exc:
+            print(f"Embedding disk cache read failed: {exc}")
+            cached = {}
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, payload_inputs):
+            if key not in cached:
+                missing.setdefault(key, text)
+        if missing:
+            vectors = self._request_embeddings(list(missing.values()))
+            if len(vectors) != len(missing):
+                raise ValueError("Remote embedding service returned mismatched result count")
+            fetched = dict(zip(missing, vectors))
+            try:
+                self.cache.set_many(fetched)
+            except sqlite3.Error as exc:
+                print(f"Embedding disk cache write failed: {exc}")
+            cached.update(fetched)
+
+        return [cached[key] for key in keys]
+
+    def _request_embeddings(self, payload_inputs: List[str]) -> List[List[float]]:
+        """Fetch embeddings, splitting large calls into length-sorted batches.
+
+        Sorting by length groups texts of similar size into the same request, so
+        the service pads each batch to a shorter maximum length. Results are put
+        back in input order.
+        """
+        if len(payload_inputs) <= self.REQUEST_BATCH_SIZE:
+            return self._post_embeddings(payload_inputs)
+
+        order = sorted(range(len(payload_inputs)), key=lambda index: len(payload_inputs[index]))
+        results: List[Optional[List[float]]] = [None] * len(payload_inputs)
+        for start in range(0, len(order), self.REQUEST_BATCH_SIZE):
+            batch_indices = order[start:start + self.REQUEST_BATCH_SIZE]
+            vectors = self._post_embeddings([payload_inputs[index] for index in batch_indices])
+            if len(vectors) != len(batch_indices):
+                raise ValueError("Remote embedding service returned mismatched result count")
+            for index, vector in zip(batch_indices, vectors):
+                results[index] = vector
+        return results  # type: ignore[return-value]
+
+    def _post_embeddings(self, payload_inputs: List[str]) -> List[List[float]]:
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -45,7 +221,7 @@ class RemoteEmbeddingClient:
             "input": payload_inputs,
         }
 
-        response = requests.post(
+        response = self.session.post(
             self.endpoint,
             headers=headers,
             json=body,
@@ -65,3 +241,13 @@ class RemoteEmbeddingClient:
                 raise ValueError(f"Invalid embedding entry: {item}")
             results.append(embedding)
         return results
+
+
+@lru_cache(maxsize=None)
+def get_embedding_client(model: str = "bge-m3") -> RemoteEmbeddingClient:
+    """Return the process-wide client for a model.
+
+    Search, ingestion and metadata extraction then share one keep-alive
+    connection pool instead of each component building its own.
+    """
+    return RemoteEmbeddingClient(model=model)
@@ -1,10 +1,124 @@
+import functools
+import hashlib
+import json
+import mmap
 import os
-from typing import List, Dict, Any
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
 
-import cv2
 import fitz
 import numpy as np
-from pdf2image import convert_from_bytes
+
+from document_processor import (
+    get_pdf_process_pool,
+    iter_pdf_page_texts,
+    pdf_source_as_path,
+    reset_pdf_process_pool,
+)
+
+# OCR 渲染阶段每个子任务渲染的页数，以及并行渲染的进程数
+OCR_RENDER_BLOCK_PAGES = 8
+OCR_RENDER_WORKERS = 4
+# 单次交给 PaddleOCR 的图片数量，批量推理可摊薄模型调用开销
+OCR_BATCH_SIZE = 8
+# PyMuPDF 提取的单页文本不超过该字符数时视为扫描页，仅对这些页进行OCR
+MIN_MEANINGFUL_PAGE_CHARS = 10
+
+# 按PDF内容哈希缓存逐页文本的目录；环境变量 CONTRACT_PDF_TEXT_CACHE 可改写路径，设为 off 关闭
+DEFAULT_PDF_TEXT_CACHE_DIR = Path(__file__).resolve().parent / ".cache" / "pdf_text"
+
+# PDF 来源：内存中的字节，或磁盘文件路径（由 PyMuPDF 直接读取，多进程任务只需传递路径）
+PdfSource = Union[bytes, str, Path]
+
+
+def _open_pdf(pdf_source: PdfSource) -> "fitz.Document":
+    """按来源类型打开 PDF：路径交给 PyMuPDF 直接读取文件，字节则按内存流打开。"""
+    if isinstance(pdf_source, (str, Path)):
+        return fitz.open(str(pdf_source), filetype="pdf")
+    return fitz.open(stream=pdf_source, filetype="pdf")
+
+
+def _hash_pdf_source(pdf_source: PdfSource) -> str:
+    """计算 PDF 内容哈希；文件路径通过只读 mmap 计算，不把整份文件复制进内存。"""
+    hasher = hashlib.blake2b(digest_size=16)
+    if isinstance(pdf_source, (str, Path)):
+        with open(pdf_source, "rb") as file:
+            if os.fstat(file.fileno()).st_size:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    hasher.update(mapped)
+    else:
+        hasher.update(pdf_source)
+    return hasher.hexdigest()
+
+
+def _page_text(page: "fitz.Page") -> str:
+    """按文本块提取单页文本（阅读顺序），跳过图片块。"""
+    # 每个块为 (x0, y0, x1, y1, text, block_no, block_type)，block_type 为 0 表示文本块
+    return "\n".join(block[4] for block in page.get_text("blocks") if block[6] == 0).strip()
+
+
+def _render_pages(
+    pdf_source: PdfSource,
+    dpi: int,
+    page_indices: Optional[Sequence[int]] = None,
+) -> List[np.ndarray]:
+    """将指定页（从0开始的页索引，默认全部页）渲染为 OpenCV 可用的 BGR 图像。
+
+    直接使用 PyMuPDF 光栅化，省去 Poppler 子进程及 JPEG 编解码。
+    """
+    images: List[np.ndarray] = []
+    matrix = fitz.Matrix(dpi / 72, dpi / 72)
+    with _open_pdf(pdf_source) as doc:
+        if page_indices is None:
+            page_indices = range(doc.page_count)
+        for page_index in page_indices:
+            pix = doc.load_page(page_index).get_pixmap(matrix=matrix, colorspace=fitz.csRGB, alpha=False)
+            rgb = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, 3)
+            # RGB 反转为 BGR；OpenCV/PaddleOCR 要求连续内存，这里仅复制一次
+            images.append(np.ascontiguousarray(rgb[:, :, ::-1]))
+    return images
+
+
+@functools.lru_cache(maxsize=1)
+def _get_ocr():
+    """进程内共享的 PaddleOCR 单例：模型只加载一次，并用空白小图预热。
+
+    仅在 ENABLE_PADDLE_OCR 开启时由 EnhancedPDFExtractor 调用；初始化失败时异常向上抛出。
+    """
+    from paddleocr import PaddleOCR  # 延迟导入，避免不必要的初始化
+
+    ocr = PaddleOCR(
+        lang='ch',
+        use_textline_orientation=True,
+        device='cpu',
+    )
+    # 预热：提前触发推理图构建与算子选择，避免首个真实请求承担冷启动开销
+    try:
+        ocr.ocr(np.zeros((64, 64, 3), dtype=np.uint8))
+    except Exception as exc:
+        print(f"警告: PaddleOCR 预热失败，将在首次识别时再初始化。错误: {exc}")
+    return ocr
+
+
+def _is_meaningful_page(text: Optional[str]) -> bool:
+    """判断单页文本是否足够长，足够则无需再对该页OCR。"""
+    return bool(text) and len(text.strip()) > MIN_MEANINGFUL_PAGE_CHARS
+
+
+def _resolve_text_cache_dir() -> Optional[Path]:
+    """读取 CONTRACT_PDF_TEXT_CACHE 配置，返回缓存目录；关闭或不可用时返回 None。"""
+    setting = os.getenv("CONTRACT_PDF_TEXT_CACHE")
+    if setting is not None and setting.strip().lower() in ("", "0", "off", "false", "none"):
+        return None
+    cache_dir = Path(setting) if setting else DEFAULT_PDF_TEXT_CACHE_DIR
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+    except OSError as exc:
+        print(f"警告: PDF文本缓存目录不可用，将不使用缓存。错误: {exc}")
+        return None
+    return cache_dir
 
 
 class EnhancedPDFExtractor:
@@ -21,97 +135,188 @@ class EnhancedPDFExtractor:
 
         if self.enable_ocr:
             try:
-                from paddleocr import PaddleOCR  # 延迟导入，避免不必要的初始化
-
-                self.ocr = PaddleOCR(
-                    lang='ch',
-                    use_textline_orientation=True,
-                    device='cpu',
-                )
+                self.ocr = _get_ocr()
             except Exception as exc:
                 print(f"警告: PaddleOCR 初始化失败，将回退到 PyMuPDF 文本提取。错误: {exc}")
                 self.enable_ocr = False
                 self.ocr = None
 
-    def extract_text_pymupdf(self, pdf_bytes: bytes) -> List[str]:
-        """使用 PyMuPDF 从PDF提取文本（逐页）。"""
+        self.cache_dir = _resolve_text_cache_dir()
+
+    def _cache_path(self, pdf_source: PdfSource) -> Optional[Path]:
+        """缓存文件路径：内容哈希 + 提取方式，避免启用OCR前后的结果互相覆盖。"""
+        if self.cache_dir is None:
+            return None
+        try:
+            digest = _hash_pdf_source(pdf_source)
+        except OSError as exc:
+            print(f"警告: 计算PDF内容哈希失败，本次不使用缓存。错误: {exc}")
+            return None
+        method = "pymupdf_ocr" if self.enable_ocr else "pymupdf"
+        return self.cache_dir / f"{digest}_{method}.json"
+
+    @staticmethod
+    def _load_cached_texts(cache_path: Optional[Path]) -> Optional[List[str]]:
+        if cache_path is None or not cache_path.is_file():
+            return None
+        try:
+            with cache_path.open("r", encoding="utf-8") as file:
+                texts = json.load(file)
+        except (OSError, ValueError) as exc:
+            print(f"警告: 读取PDF文本缓存失败，将重新解析。错误: {exc}")
+            return None
+        return texts if isinstance(texts, list) else None
+
+    @staticmethod
+    def _store_cached_texts(cache_path: Optional[Path], texts: List[str]) -> None:
+        """先写临时文件再 os.replace，避免并发上传读到半截文件。"""
+        if cache_path is None:
+            return
+        try:
+            fd, tmp_name = tempfile.mkstemp(dir=str(cache_path.parent), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as file:
+                    json.dump(texts, file, ensure_ascii=False)
+                os.replace(tmp_name, cache_path)
+            except BaseException:
+                os.unlink(tmp_name)
+                raise
+        except OSError as exc:
+            print(f"警告: 写入PDF文本缓存失败: {exc}")
+
+    def extract_text_pymupdf(self, pdf_source: PdfSource) -> List[str]:
+        """使用 PyMuPDF 从PDF提取文本（逐页）；页数较多时按页块分发到多个进程并行提取。"""
         texts: List[str] = []
         try:
-            with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
-                for page_index in range(doc.page_count):
-                    page = doc.load_page(page_index)
-                    page_text = page.get_text("text") or ""
-                    texts.append(page_text.strip())
+            # 分页与多进程调度复用 document_processor 的统一实现，此处只提供按文本块的单页提取
+            texts.extend(iter_pdf_page_texts(pdf_source, _page_text))
         except Exception as exc:
             print(f"PyMuPDF文本提取失败: {exc}")
         return texts
 
-    def pdf_bytes_to_images(self, pdf_bytes: bytes, dpi: int = 180) -> List[np.ndarray]:
-        """将PDF字节流转换为OpenCV可用的图像列表。"""
+    def pdf_bytes_to_images(self, pdf_source: PdfSource, dpi: int = 180) -> List[np.ndarray]:
+        """将PDF字节流或文件转换为OpenCV可用的图像列表。"""
         try:
-            images = convert_from_bytes(
-                pdf_bytes,
-                dpi=dpi,
-                fmt='jpeg',
-            )
-            return [cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR) for image in images]
+            return _render_pages(pdf_source, dpi)
         except Exception as exc:
             print(f"PDF转图片失败: {exc}")
             return []
 
-    def extract_text_ocr(self, pdf_bytes: bytes, max_pages: int = None) -> List[str]:
-        """使用 PaddleOCR 提取文本。若未启用OCR则返回空列表。"""
+    def _render_pages_parallel(
+        self,
+        pdf_source: PdfSource,
+        dpi: int = 180,
+        max_pages: Optional[int] = None,
+        workers: int = OCR_RENDER_WORKERS,
+        page_indices: Optional[Sequence[int]] = None,
+    ) -> Iterator[np.ndarray]:
+        """按页块分发到多个进程渲染，按给定页序逐页产出图像，使渲染与OCR识别重叠进行。
+
+        page_indices 为从0开始的页索引，默认渲染全部页。
+        """
+        if page_indices is None:
+            with _open_pdf(pdf_source) as doc:
+                page_indices = range(doc.page_count)
+        page_indices = list(page_indices)
+        if max_pages:
+            page_indices = page_indices[:max_pages]
+        if not page_indices:
+            return
+
+        block = OCR_RENDER_BLOCK_PAGES
+        blocks = [page_indices[start:start + block] for start in range(0, len(page_indices), block)]
+        workers = max(1, min(workers, os.cpu_count() or 1, len(blocks)))
+        executor = get_pdf_process_pool()
+        try:
+            # 每波最多提交 workers 个页块，消费完再提交下一波，控制驻留内存的图像数量
+            for wave_start in range(0, len(blocks), workers):
+                wave = blocks[wave_start:wave_start + workers]
+                for images in executor.map(
+                    _render_pages,
+                    [pdf_source] * len(wave),
+                    [dpi] * len(wave),
+                    wave,
+                ):
+                    yield from images
+        except BrokenProcessPool:
+            reset_pdf_process_pool(executor)
+            raise
+
+    @staticmethod
+    def _ocr_result_to_text(result: Any) -> str:
+        """将单页 OCR 结果整理为文本，仅保留置信度大于0.5的行。"""
+        if not result:
+            return ""
+        # 一次遍历筛选后统一 join，避免逐行字符串拼接的反复分配
+        return "\n".join(
+            line[1][0] for line in result if len(line) >= 2 and line[1][1] > 0.5
+        ).strip()
+
+    def _ocr_batch(self, images: List[np.ndarray], page_numbers: Sequence[int]) -> List[str]:
+        """批量识别一组页面图像，返回与输入一一对应的文本。"""
+        print(f"正在OCR识别第{'、'.join(str(number) for number in page_numbers)}页...")
+        results = self.ocr.ocr(images) or []
+        texts = [self._ocr_result_to_text(result) for result in results[:len(images)]]
+        texts.extend([""] * (len(images) - len(texts)))
+        return texts
+
+    def extract_text_ocr(
+        self,
+        pdf_source: PdfSource,
+        max_pages: int = None,
+        page_indices: Optional[Sequence[int]] = None,
+    ) -> List[str]:
+        """使用 PaddleOCR 提取文本。若未启用OCR则返回空列表。
+
+        page_indices 指定只识别哪些页（从0开始），返回的文本与其一一对应；默认识别全部页。
+        """
         if not self.enable_ocr or self.ocr is None:
             return []
 
         try:
-            images = self.pdf_bytes_to_images(pdf_bytes)
-            if not images:
-                return []
+            texts: List[str] = []
+            batch: List[np.ndarray] = []
+            page_numbers = (
+                [index + 1 for index in page_indices] if page_indices is not None else None
+            )
 
-            if max_pages:
-                images = images[:max_pages]
+            def _batch_page_numbers() -> List[int]:
+                start = len(texts)
+                if page_numbers is None:
+                    return list(range(start + 1, start + len(batch) + 1))
+                return page_numbers[start:start + len(batch)]
 
-            texts: List[str] = []
-            for page_num, cv_image in enumerate(images, 1):
-                print(f"正在OCR识别第{page_num}页...")
-                result = self.ocr.ocr(cv_image)
-
-                page_text = ""
-                if result and result[0]:
-                    for line in result[0]:
-                        if len(line) >= 2:
-                            text = line[1][0]
-                            confidence = line[1][1]
-                            if confidence > 0.5:
-                                page_text += text + "\n"
-                texts.append(page_text.strip())
+            for cv_image in self._render_pages_parallel(
+                pdf_source, max_pages=max_pages, page_indices=page_indices
+            ):
+                batch.append(cv_image)
+                if len(batch) >= OCR_BATCH_SIZE:
+                    texts.extend(self._ocr_batch(batch, _batch_page_numbers()))
+                    batch = []
+            if batch:
+                texts.extend(self._ocr_batch(batch, _batch_page_numbers()))
 
             return texts
         except Exception as exc:
             print(f"OCR识别失败: {exc}")
             return []
 
-    def extract_text(self, pdf_bytes: bytes, pdf_name: str = None) -> List[Dict[str, Any]]:
-        """综合提取逻辑：先尝试 PyMuPDF，再按需回退到OCR。"""
-        texts: List[str] = []
-        meaningful: List[str] = []
+    def extract_text(self, pdf_source: PdfSource, pdf_name: str = None) -> List[Dict[str, Any]]:
+        """综合提取逻辑：先查内容哈希缓存，未命中时先尝试 PyMuPDF，再按需回退到OCR。
 
-        if self.enable_ocr:
-            texts = self.extract_text_ocr(pdf_bytes)
-            meaningful = [text for text in texts if text and text.strip()]
-            if meaningful:
-                print("已使用PaddleOCR完成文本识别")
-
-        if not meaningful:
-            pymupdf_texts = self.extract_text_pymupdf(pdf_bytes)
-            meaningful = [text for text in pymupdf_texts if text and text.strip()]
-            if meaningful:
-                texts = pymupdf_texts
-                if self.enable_ocr:
-                    print("PaddleOCR未获取有效文本，回退至PyMuPDF提取")
-            elif not self.enable_ocr:
-                print("PyMuPDF未提取到有效内容。如需OCR识别，请设置 ENABLE_PADDLE_OCR=1 后重试。")
+        pdf_source 可以是PDF字节，也可以是文件路径；字节来源在解析前写入一次临时文件，
+        PyMuPDF 与OCR渲染的子进程都只传递路径，无需把整份PDF字节序列化后逐个任务复制。
+        """
+        cache_path = self._cache_path(pdf_source)
+        cached_texts = self._load_cached_texts(cache_path)
+        if cached_texts is not None:
+            texts = cached_texts
+        else:
+            with pdf_source_as_path(pdf_source) as pdf_path:
+                texts = self._extract_page_texts(pdf_path)
+            # 解析失败（无有效内容）时不写缓存，便于修复环境后重试
+            if any(text and text.strip() for text in texts):
+                self._store_cached_texts(cache_path, texts)
 
         final_result: List[Dict[str, Any]] = []
         for page_index, text in enumerate(texts, 1):
@@ -130,3 +335,32 @@ class EnhancedPDFExtractor:
             }]
 
         return final_result
+
+    def _extract_page_texts(self, pdf_source: PdfSource) -> List[str]:
+        """逐页提取文本：先用 PyMuPDF 提取全部页，再只对文本不足的页进行OCR。"""
+        # PyMuPDF 远快于OCR；混合PDF（如文字封面 + 扫描正文）中只有扫描页需要OCR
+        texts = self.extract_text_pymupdf(pdf_source)
+
+        if not self.enable_ocr:
+            if not any(text and text.strip() for text in texts):
+                print("PyMuPDF未提取到有效内容。如需OCR识别，请设置 ENABLE_PADDLE_OCR=1 后重试。")
+            return texts
+
+        if not texts:
+            # PyMuPDF 提取失败（无法得到页数），整份文档交给OCR
+            return self.extract_text_ocr(pdf_source)
+
+        weak_pages = [index for index, text in enumerate(texts) if not _is_meaningful_page(text)]
+        if not weak_pages:
+            return texts
+
+        ocr_texts = self.extract_text_ocr(pdf_source, page_indices=weak_pages)
+        recognized = 0
+        for page_index, ocr_text in zip(weak_pages, ocr_texts):
+            if ocr_text and ocr_text.strip():
+                texts[page_index] = ocr_text
+                recognized += 1
+        if recognized:
+            print(f"已使用PaddleOCR识别{recognized}个文本不足的页面")
+
+        return texts
@@ -0,0 +1,74 @@
+from functools import lru_cache
+from typing import Any
+
+import orjson
+from elasticsearch import AsyncElasticsearch, Elasticsearch
+from elasticsearch.serializer import JSONSerializer
+
+
+DEFAULT_ES_HOST = "http://localhost:9200"
+
+# 共享客户端的连接池大小（每个节点），需覆盖 API 线程池与后台入库的并发
+ES_CONNECTIONS_PER_NODE = 50
+ES_REQUEST_TIMEOUT_SECONDS = 30
+ES_MAX_RETRIES = 3
+
+
+class OrjsonSerializer(JSONSerializer):
+    """
+    使用 orjson 编码请求体、解析响应体
+
+    向量等大数组的编码速度明显快于标准库 json，并可直接序列化 numpy 数组；
+    orjson 不支持的类型仍交给父类的 default 处理。检索响应中的 _source 文本、
+    高亮片段同样由 orjson 解析。
+    """
+
+    def dumps(self, data: Any) -> bytes:
+        if isinstance(data, (str, bytes)):
+            return super().dumps(data)
+        return orjson.dumps(data, default=self.default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    def loads(self, data: bytes) -> Any:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # 保持与父类一致的异常类型（SerializationError）
+            return super().loads(data)
+
+
+@lru_cache(maxsize=None)
+def get_es_client(es_host: str = DEFAULT_ES_HOST) -> Elasticsearch:
+    """
+    按地址返回共享的 Elasticsearch 客户端
+
+    同一进程内的检索、删除、入库等组件复用同一个客户端及其 HTTP 连接池，
+    避免每个模块各自建立连接。
+    """
+    return Elasticsearch(
+        es_host,
+        http_compress=True,
+        connections_per_node=ES_CONNECTIONS_PER_NODE,
+        request_timeout=ES_REQUEST_TIMEOUT_SECONDS,
+        retry_on_timeout=True,
+        max_retries=ES_MAX_RETRIES,
+        serializer=OrjsonSerializer(),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_async_es_client(es_host: str = DEFAULT_ES_HOST) -> AsyncElasticsearch:
+    """
+    按地址返回共享的异步 Elasticsearch 客户端（基于 aiohttp）
+
+    供 async 接口直接 await 检索，不占用线程池；连接池配置与同步客户端一致。
+    需在事件循环内使用，应用关闭时应 await client.close()。
+    """
+    return AsyncElasticsearch(
+        es_host,
+        http_compress=True,
+        connections_per_node=ES_CONNECTIONS_PER_NODE,
+        request_timeout=ES_REQUEST_TIMEOUT_SECONDS,
+        retry_on_timeout=True,
+        max_retries=ES_MAX_RETRIES,
+        serializer=OrjsonSerializer(),
+    )
@@ -1,10 +1,29 @@
+import asyncio
+import heapq
+from contextlib import asynccontextmanager
+from operator import itemgetter
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from elasticsearch import Elasticsearch
+from embedding_client import RemoteEmbeddingClient, quantize_to_int8
+from es_client import get_async_es_client
+
 
-from embedding_client import RemoteEmbeddingClient
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """启动时注册搜索模板，关闭时释放 ES 异步客户端"""
+    try:
+        await _ensure_search_templates()
+    except Exception as exc:
+        print(f"警告: 注册搜索模板失败，将在首次检索时重试。错误: {exc}")
+    yield
+    await es.close()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 # 初始化远程向量服务
 try:
@@ -13,86 +32,178 @@ except Exception as exc:
     print(f"Embedding service初始化失败: {exc}")
     embedding_client = None
 
-# Elasticsearch 连接
-es = Elasticsearch("http://localhost:9200")
+# Elasticsearch 连接（异步客户端，检索时直接 await，不占用线程池）
+es = get_async_es_client("http://localhost:9200")
 index_name = "contracts_unified"
+# 混合检索按倒数排名融合（RRF）：每路取前 RRF_RANK_WINDOW_SIZE 条参与融合
+RRF_RANK_WINDOW_SIZE = 50
+RRF_RANK_CONSTANT = 60
+KNN_NUM_CANDIDATES = 100
+
+# 两路检索的请求体注册为 ES 存储的搜索模板，每次请求只传参数
+TEXT_SEARCH_TEMPLATE_ID = "contract_text_search_tpl"
+KNN_SEARCH_TEMPLATE_ID = "contract_knn_search_tpl"
+SEARCH_TEMPLATES = {
+    TEXT_SEARCH_TEMPLATE_ID: """{
+        "size": {{size}},
+        "query": {
+            "multi_match": {
+                "query": {{#toJson}}query_text{{/toJson}},
+                "type": "best_fields",
+                "fields": ["text^3", "text.ngram"],
+                "operator": "or",
+                "fuzziness": "AUTO"
+            }
+        },
+        "_source": {"excludes": ["text_vector"]}
+    }""",
+    KNN_SEARCH_TEMPLATE_ID: """{
+        "size": {{size}},
+        "knn": {
+            "field": "text_vector",
+            "query_vector": {{#toJson}}query_vector{{/toJson}},
+            "k": {{size}},
+            "num_candidates": {{num_candidates}}
+        },
+        "_source": {"excludes": ["text_vector"]},
+        "track_total_hits": false
+    }""",
+}
+_search_templates_ready = False
+
+# 查询向量微批：收到首个查询后最多再等待该时长，把同期到达的查询合并成一次向量服务请求
+EMBED_BATCH_WINDOW_SECONDS = 0.008
+EMBED_MAX_BATCH_SIZE = 32
+
+_embed_queue: Optional["asyncio.Queue[Tuple[str, asyncio.Future]]"] = None
+_embed_worker: Optional[asyncio.Task] = None
+_embed_dispatches: Set[asyncio.Task] = set()
+
+
+async def _dispatch_embed_batch(batch: List[Tuple[str, asyncio.Future]]) -> None:
+    """在线程池中批量请求向量，并把结果逐一回填给等待中的查询"""
+    try:
+        vectors = await run_in_threadpool(embedding_client.embed, [text for text, _ in batch])
+    except Exception as exc:
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(exc)
+        return
+
+    for position, (_, future) in enumerate(batch):
+        if future.done():
+            continue
+        if position < len(vectors):
+            future.set_result(vectors[position])
+        else:
+            future.set_exception(RuntimeError("向量服务返回空结果"))
+
+
+async def _embed_batch_loop(queue: "asyncio.Queue[Tuple[str, asyncio.Future]]") -> None:
+    """后台任务：按时间窗口/批大小聚合查询，每批发起一次向量请求"""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + EMBED_BATCH_WINDOW_SECONDS
+        while len(batch) < EMBED_MAX_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # 各批并发发送，避免慢请求阻塞后续批次
+        task = asyncio.create_task(_dispatch_embed_batch(batch))
+        _embed_dispatches.add(task)
+        task.add_done_callback(_embed_dispatches.discard)
+
+
+async def _embed_query(text: str) -> List[float]:
+    """提交单条查询到微批队列并等待其向量"""
+    global _embed_queue, _embed_worker
+    if _embed_worker is None or _embed_worker.done():
+        _embed_queue = asyncio.Queue()
+        _embed_worker = asyncio.create_task(_embed_batch_loop(_embed_queue))
+
+    future = asyncio.get_running_loop().create_future()
+    await _embed_queue.put((text, future))
+    return await future
 
 # 请求体模型
 class SearchRequest(BaseModel):
     query_text: str
-    text_match_weight: float = 3.0  # 文本匹配权重
-    vector_match_weight: float = 5.0  # 向量匹配权重
-    fuzzy_match_weight: float = 2.0  # 模糊匹配权重
     size: int = 3  # 返回结果数量
 
+
+def _rrf_fuse(hit_lists: Sequence[List[Dict[str, Any]]], size: int) -> List[Dict[str, Any]]:
+    """按文档在各路结果中的排名 r 累加 1 / (RRF_RANK_CONSTANT + r)，返回得分最高的 size 条"""
+    fused: Dict[str, Dict[str, Any]] = {}
+    for hits in hit_lists:
+        for rank, hit in enumerate(hits, start=1):
+            entry = fused.setdefault(hit["_id"], {"hit": hit, "score": 0.0})
+            entry["score"] += 1.0 / (RRF_RANK_CONSTANT + rank)
+    return heapq.nlargest(size, fused.values(), key=itemgetter("score"))
+
+
+async def _ensure_search_templates() -> None:
+    """注册（覆盖）存储的搜索模板；成功后不再重复注册"""
+    global _search_templates_ready
+    if _search_templates_ready:
+        return
+    for template_id, source in SEARCH_TEMPLATES.items():
+        await es.put_script(id=template_id, script={"lang": "mustache", "source": source})
+    _search_templates_ready = True
+
+
 @app.post("/search")
-def semantic_search(request: SearchRequest):
+async def semantic_search(request: SearchRequest):
     try:
         if embedding_client is None:
             raise RuntimeError("远程向量服务不可用，无法执行向量检索")
 
-        # 生成查询向量
-        vectors = embedding_client.embed(request.query_text)
-        if not vectors:
-            raise RuntimeError("向量服务返回空结果")
-        query_vector = vectors[0]
-
-        # 构建搜索体
-        body = {
-            "size": request.size,
-            "query": {
-                "function_score": {
-                    "query": {
-                        "multi_match": {
-                            "query": request.query_text,
-                            "type": "best_fields",
-                            "fields": ["text.standard^3", "text.ngram"],
-                            "operator": "or",
-                            "fuzziness": "AUTO"
-                        }
-                    },
-                    "boost_mode": "sum",
-                    "functions": [
-                        {
-                            "script_score": {
-                                "script": {
-                                    "source": "cosineSimilarity(params.query_vector, 'text_vector') + 1.0",
-                                    "params": {
-                                        "query_vector": query_vector
-                                    }
-                                }
-                            },
-                            "weight": request.vector_match_weight
-                        }
-                    ]
-                }
-            },
-            "highlight": {
-                "fields": {
-                    "text.standard": {},
-                    "text.ngram": {}
-                }
-            }
-        }
+        # 生成查询向量（与同期到达的其它查询合并为一次批量请求）
+        # contracts_unified 的 text_vector 为 byte 字段，查询向量同样量化为 int8 的 NumPy 数组，
+        # 由共享 ES 客户端直接序列化，不再构造 Python 浮点列表
+        query_vector = quantize_to_int8(await _embed_query(request.query_text))
+
+        # 文本匹配与近似 kNN（HNSW）分两路检索，经一次 msearch 往返返回，再在本地按 RRF 融合；
+        # 融合只看排名，无需调节两路得分的权重。响应不返回高亮片段，两路均不做高亮
+        window = max(request.size, RRF_RANK_WINDOW_SIZE)
+        await _ensure_search_templates()
 
         # 执行搜索
-        results = es.search(index=index_name, body=body)
-
-        # 处理结果
-        processed_results = []
-        for hit in results["hits"]["hits"]:
-            source = hit["_source"]
-            processed_results.append({
-                "score": hit['_score'],
-                "contract_name": source['contractName'],
-                "page_id": source['pageId'],
-                "text": source["text"]
-            })
-
-        return {
-            "total_hits": results["hits"]["total"]["value"],
-            "results": processed_results
-        }
+        responses = (await es.msearch_template(search_templates=[
+            {"index": index_name},
+            {"id": TEXT_SEARCH_TEMPLATE_ID, "params": {"size": window, "query_text": request.query_text}},
+            {"index": index_name},
+            {"id": KNN_SEARCH_TEMPLATE_ID, "params": {
+                "size": window,
+                "num_candidates": max(window, KNN_NUM_CANDIDATES),
+                "query_vector": query_vector
+            }}
+        ]))["responses"]
+        for response in responses:
+            if "error" in response:
+                raise RuntimeError(f"检索失败: {response['error']}")
+        text_results, knn_results = responses
+
+        fused = _rrf_fuse([text_results["hits"]["hits"], knn_results["hits"]["hits"]], request.size)
+        total_hits = text_results["hits"]["total"]["value"]
+
+        return ORJSONResponse({
+            "total_hits": total_hits,
+            "results": [
+                {
+                    "score": entry["score"],
+                    "contract_name": entry["hit"]["_source"]['contractName'],
+                    "page_id": entry["hit"]["_source"]['pageId'],
+                    "text": entry["hit"]["_source"]["text"]
+                }
+                for entry in fused
+            ]
+        })
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
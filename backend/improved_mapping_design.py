@@ -15,9 +15,11 @@ unified_mapping = {
     "settings": {
         "analysis": {
             "tokenizer": {
+                # ngram 子字段的检索分析器是 standard（中文按单字切分），只有长度与 gram 相同的
+                # 字母/数字词才能命中；取 3-gram 单一长度，词项数约为 2~3-gram 的一半
                 "ngram_tokenizer": {
                     "type": "ngram",
-                    "min_gram": 2,
+                    "min_gram": 3,
                     "max_gram": 3,
                     "token_chars": ["letter", "digit"]
                 }
@@ -44,22 +46,26 @@ unified_mapping = {
             },
             "text": {
                 "type": "text",
+                # 主字段已使用 standard 分词，不再重复建 text.standard 子字段；
+                # ngram 子字段只用于词项匹配打分，不记录位置信息以缩小倒排索引
                 "fields": {
                     "ngram": {
                         "type": "text",
                         "analyzer": "ngram_analyzer",
-                        "search_analyzer": "standard"
-                    },
-                    "standard": {
-                        "type": "text",
-                        "analyzer": "standard"
+                        "search_analyzer": "standard",
+                        "index_options": "freqs"
                     }
                 },
                 "analyzer": "standard",
-                "search_analyzer": "standard"
+                "search_analyzer": "standard",
+                # 记录词项偏移，unified 高亮器可直接从倒排表取片段，无需对每个命中重新分词
+                "index_options": "offsets"
             },
+            # 向量在写入前经 quantize_to_int8 按各自最大绝对值缩放到 [-127, 127] 后以 int8 存储，
+            # 原始向量与 HNSW 图均为 float32 的 1/4；查询向量同样量化
             "text_vector": {
                 "type": "dense_vector",
+                "element_type": "byte",
                 "dims": 1024,
                 "index": True,
                 "similarity": "cosine"
@@ -152,7 +158,7 @@ example_doc_page1 = {
     "contractName": "sample_contract",
     "pageId": 1,
     "text": "合同第一页内容...",
-    "text_vector": [0.1, 0.2, 0.3],  # 1024维向量
+    "text_vector": [12, -7, 127],  # 1024维 int8 向量
     "document_metadata": {
         "customer_name": "甲方公司",
         "our_entity": "中软国际科技服务有限公司", 
@@ -176,7 +182,7 @@ example_doc_page2 = {
     "contractName": "sample_contract",
     "pageId": 2,
     "text": "合同第二页内容...",
-    "text_vector": [0.4, 0.5, 0.6],
+    "text_vector": [31, 88, -127],
     "document_metadata": None,  # 其他页面不存储元数据
     "created_at": "2024-01-15T09:00:00",
     "updated_at": "2024-01-15T09:00:00",
@@ -1,4 +1,10 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+import httpx
 import json
 import time
 import re
@@ -23,17 +29,71 @@ DEFAULT_CUSTOMER_CATEGORY_PATH = (
     Path(__file__).resolve().parents[1] / "金融客户白名单.xlsx"
 )
 
+DEFAULT_LLM_RESPONSE_CACHE_PATH = Path(__file__).resolve().parent / ".cache" / "llm_responses.sqlite3"
+
 from document_processor import DocumentProcessor
-from embedding_client import RemoteEmbeddingClient
+from embedding_client import get_embedding_client, normalize_l2
 from customer_category_loader import CustomerCategoryLookup
 
+
+class LLMResponseCache:
+    """
+    以请求体内容哈希为键的LLM响应缓存（SQLite）
+
+    键由模型、系统提示词、完整Prompt与采样参数共同决定，修改Prompt模板后旧缓存自然失效。
+    只缓存原始响应文本：客户分类等后处理与向量生成仍按当前配置重新执行。
+    """
+
+    def __init__(self, path: Any) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(request_data: Dict[str, Any]) -> str:
+        payload = json.dumps(request_data, ensure_ascii=False, sort_keys=True)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, response: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response) VALUES (?, ?)", (key, response)
+            )
+            self._conn.commit()
+
+
+def _open_llm_response_cache() -> Optional[LLMResponseCache]:
+    """打开 CONTRACT_LLM_CACHE 指定的缓存（设为 off 关闭）"""
+    setting = os.getenv("CONTRACT_LLM_CACHE")
+    if setting is not None and setting.strip().lower() in ("", "0", "off", "false", "none"):
+        return None
+    try:
+        return LLMResponseCache(setting or DEFAULT_LLM_RESPONSE_CACHE_PATH)
+    except (OSError, sqlite3.Error) as exc:
+        print(f"警告: LLM响应缓存不可用，将不使用缓存。错误: {exc}")
+        return None
+
+
 class MetadataExtractor:
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, batch_size: int = 4, max_concurrency: int = 4):
         """
         初始化元数据提取器
 
         Args:
             api_key: DeepSeek API密钥，如果不提供则尝试从环境变量读取
+            batch_size: 长文本分块提取时单次LLM调用合并的文本块数量
+            max_concurrency: 异步接口同时在途的LLM请求上限，避免超出服务端QPS限制
         """
         self.api_key = api_key or os.getenv("CONTRACT_API_KEY") or os.getenv("DEEPSEEK_API_KEY")
         if not self.api_key:
@@ -42,10 +102,27 @@ class MetadataExtractor:
         self.model = "DeepSeekV3"
         self.max_retries = 3
         self.retry_delay = 1  # 秒
+        self.request_timeout = 30  # 秒
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        # 异步接口使用的 HTTP 客户端与并发信号量，首次在事件循环中调用时创建
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_semaphore: Optional[asyncio.Semaphore] = None
+        # 同步接口复用同一个 keep-alive 会话，避免每次调用重新建立 TCP 连接；
+        # 重试由 _call_llm_api 自行控制，适配器不再重试
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.headers.update({"Content-Type": "application/json"})
+        if self.api_key:
+            self._session.headers.update({"Authorization": f"Bearer {self.api_key}"})
+        # 相同合同文本与Prompt的LLM响应在进程重启后仍可复用
+        self._response_cache = _open_llm_response_cache()
         
         # 初始化向量服务（与正文内容使用相同的模型）
         try:
-            self.vector_client = RemoteEmbeddingClient(model="bge-m3")
+            self.vector_client = get_embedding_client("bge-m3")
             print("向量服务初始化成功")
         except Exception as e:
             print(f"向量服务初始化失败: {e}")
@@ -127,13 +204,39 @@ CONTRACT_TEXT_PLACEHOLDER
 }}
 """
         return base_template
-    
-    def _call_llm_api(self, prompt: str) -> str:
+
+    def _get_batch_prompt_template(self, count: int) -> Tuple[str, str]:
+        """
+        多份合同合并提取的Prompt模板，复用单份模板的字段说明与提取规则
+
+        Args:
+            count: 本次合并的合同数量
+
+        Returns:
+            元组：(合同文本之前的说明部分, 合同文本之后的输出格式要求)
+        """
+        base_template = self._get_prompt_template()
+        rules, _, rest = base_template.partition("合同文本：")
+        _, _, item_format = rest.partition("格式如下：")
+
+        header = (
+            rules
+            + f"以下共有{count}份相互独立的合同，分别以 CONTRACT_1 至 CONTRACT_{count} 标注，"
+            "请逐份按上述规则提取，不要混用不同合同的信息。\n\n"
+        )
+        footer = f"""
+请返回一个包含{count}个元素的JSON数组，第i个元素对应 CONTRACT_i，每个元素的格式如下：
+{item_format.strip()}
+"""
+        return header, footer
+
+    def _call_llm_api(self, prompt: str, max_tokens: int = 2000) -> str:
         """
         调用DeepSeek API
         
         Args:
             prompt: 发送给API的提示词
+            max_tokens: 允许生成的最大 token 数
         
         Returns:
             API返回的文本内容
@@ -141,45 +244,15 @@ CONTRACT_TEXT_PLACEHOLDER
         Raises:
             Exception: API调用失败时抛出异常
         """
-        if not self.api_key:
-            raise RuntimeError("DeepSeek API 密钥未配置（请设置环境变量 CONTRACT_API_KEY）")
-
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": self.model,
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "你是一个专业的合同分析专家，擅长从合同文本中提取结构化信息。请严格按照要求的JSON格式返回结果。"
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "temperature": 0.1,
-            "max_tokens": 2000,
-            "top_p": 0.95,
-            "stream": False
-        }
+        # 请求头已在会话上设置
+        _, data = self._build_llm_request(prompt, max_tokens)
         
         for attempt in range(self.max_retries):
             try:
-                response = requests.post(self.api_url, headers=headers, json=data, timeout=30)
+                response = self._session.post(self.api_url, json=data, timeout=self.request_timeout)
                 
                 if response.status_code == 200:
-                    result = response.json()
-                    choices = result.get("choices")
-                    if choices and isinstance(choices, list):
-                        message = choices[0].get("message", {})
-                        content = message.get("content")
-                        if content:
-                            return content.strip()
-                    raise Exception(f"API响应格式错误: {result}")
+                    return self._read_llm_content(response.json())
                 elif response.status_code == 429:
                     if attempt < self.max_retries - 1:
                         wait_time = self.retry_delay * (2 ** attempt)  # 指数退避
@@ -214,6 +287,131 @@ CONTRACT_TEXT_PLACEHOLDER
                     raise Exception(f"API调用失败: {str(e)}")
         
         raise Exception("API调用失败，已达到最大重试次数")
+
+    async def _call_llm_api_async(self, prompt: str) -> str:
+        """
+        _call_llm_api 的异步版本：等待响应与重试间隔期间不占用线程
+        """
+        headers, data = self._build_llm_request(prompt)
+
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=self.request_timeout,
+                limits=httpx.Limits(max_connections=32, keepalive_expiry=60),
+            )
+        if self._async_semaphore is None:
+            self._async_semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        for attempt in range(self.max_retries):
+            try:
+                # 只限制在途请求数；重试等待期间不占用并发名额
+                async with self._async_semaphore:
+                    response = await self._async_client.post(self.api_url, headers=headers, json=data)
+
+                if response.status_code == 200:
+                    return self._read_llm_content(response.json())
+                elif response.status_code == 429:
+                    if attempt < self.max_retries - 1:
+                        wait_time = self.retry_delay * (2 ** attempt)  # 指数退避
+                        print(f"API调用频率限制，等待{wait_time}秒后重试...")
+                        await asyncio.sleep(wait_time)
+                        continue
+                    else:
+                        raise Exception("API调用频率限制，重试次数已用完")
+                else:
+                    error_msg = f"API调用失败，状态码: {response.status_code}, 响应: {response.text}"
+                    if attempt < self.max_retries - 1:
+                        print(f"API错误，重试中... 错误信息: {error_msg}")
+                        await asyncio.sleep(self.retry_delay * (2 ** attempt))
+                        continue
+                    else:
+                        raise Exception(error_msg)
+
+            except httpx.HTTPError as e:
+                if attempt < self.max_retries - 1:
+                    print(f"网络错误，重试中... 错误信息: {str(e)}")
+                    await asyncio.sleep(self.retry_delay * (2 ** attempt))
+                    continue
+                else:
+                    raise Exception(f"网络请求失败: {str(e)}")
+
+            except Exception as e:
+                if attempt < self.max_retries - 1:
+                    print(f"未知错误，重试中... 错误信息: {str(e)}")
+                    await asyncio.sleep(self.retry_delay * (2 ** attempt))
+                    continue
+                else:
+                    raise Exception(f"API调用失败: {str(e)}")
+
+        raise Exception("API调用失败，已达到最大重试次数")
+
+    async def aclose(self) -> None:
+        """关闭异步 HTTP 客户端，应由应用关闭流程调用；之后再调用异步接口会重新创建"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        self._async_semaphore = None
+
+    def _lookup_cached_response(self, prompt: str, max_tokens: int = 2000) -> Tuple[Optional[str], Optional[str]]:
+        """返回 (缓存键, 已缓存的响应文本)；未启用缓存时缓存键为 None"""
+        if self._response_cache is None:
+            return None, None
+        _, data = self._build_llm_request(prompt, max_tokens)
+        cache_key = LLMResponseCache.make_key(data)
+        try:
+            return cache_key, self._response_cache.get(cache_key)
+        except sqlite3.Error as exc:
+            print(f"警告: 读取LLM响应缓存失败: {exc}")
+            return cache_key, None
+
+    def _store_cached_response(self, cache_key: Optional[str], response_text: str) -> None:
+        """解析与清理成功后才写入缓存，避免无法解析的响应被反复复用"""
+        if cache_key is None or self._response_cache is None:
+            return
+        try:
+            self._response_cache.set(cache_key, response_text)
+        except sqlite3.Error as exc:
+            print(f"警告: 写入LLM响应缓存失败: {exc}")
+
+    def _build_llm_request(self, prompt: str, max_tokens: int = 2000) -> Tuple[Dict[str, str], Dict[str, Any]]:
+        """构造 LLM 接口的请求头与请求体"""
+        if not self.api_key:
+            raise RuntimeError("DeepSeek API 密钥未配置（请设置环境变量 CONTRACT_API_KEY）")
+
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        data = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "你是一个专业的合同分析专家，擅长从合同文本中提取结构化信息。请严格按照要求的JSON格式返回结果。"
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.1,
+            "max_tokens": max_tokens,
+            "top_p": 0.95,
+            "stream": False
+        }
+        return headers, data
+
+    @staticmethod
+    def _read_llm_content(result: Dict[str, Any]) -> str:
+        """从 chat/completions 响应中取出文本内容"""
+        choices = result.get("choices")
+        if choices and isinstance(choices, list):
+            message = choices[0].get("message", {})
+            content = message.get("content")
+            if content:
+                return content.strip()
+        raise Exception(f"API响应格式错误: {result}")
     
     def _parse_json_response(self, response_text: str) -> Dict[str, Any]:
         """
@@ -288,6 +486,45 @@ CONTRACT_TEXT_PLACEHOLDER
                 except json.JSONDecodeError as e2:
                     raise Exception(f"JSON解析失败: {str(e2)}\n原始响应: {response_text[:1000]}")
     
+    def _parse_json_array_response(self, response_text: str, count: int) -> List[Dict[str, Any]]:
+        """
+        解析合并提取返回的JSON数组
+
+        Args:
+            response_text: API返回的文本
+            count: 期望的元素数量
+
+        Returns:
+            与输入合同一一对应的元数据字典列表
+
+        Raises:
+            Exception: 解析失败或元素数量不符时抛出异常
+        """
+        print(f"原始LLM响应: {response_text[:500]}...")  # 打印前500字符用于调试
+
+        cleaned_text = response_text.strip()
+        if '```json' in cleaned_text:
+            start_marker = cleaned_text.find('```json') + 7
+            end_marker = cleaned_text.find('```', start_marker)
+            if end_marker != -1:
+                cleaned_text = cleaned_text[start_marker:end_marker].strip()
+
+        try:
+            parsed = json.loads(cleaned_text)
+        except json.JSONDecodeError:
+            start_idx = cleaned_text.find('[')
+            end_idx = cleaned_text.rfind(']') + 1
+            if start_idx == -1 or end_idx == 0:
+                raise Exception("响应中未找到有效的JSON数组")
+            try:
+                parsed = json.loads(cleaned_text[start_idx:end_idx])
+            except json.JSONDecodeError as e:
+                raise Exception(f"JSON解析失败: {str(e)}\n原始响应: {response_text[:1000]}")
+
+        if not isinstance(parsed, list) or len(parsed) != count or not all(isinstance(item, dict) for item in parsed):
+            raise Exception(f"JSON数组结构不符合预期：需要{count}个对象")
+        return parsed
+
     def _validate_and_clean_metadata(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
         """
         验证和清理提取的元数据
@@ -504,7 +741,11 @@ CONTRACT_TEXT_PLACEHOLDER
                 print("向量服务返回空结果，无法生成向量")
                 return None
 
-            vector = np.asarray(vector_results[0], dtype=float)
+            # metadata_vector 使用 dot_product 相似度，写入前归一化为单位向量
+            vector = normalize_l2(vector_results[0])
+            if vector is None:
+                print("向量服务返回零向量，无法生成向量")
+                return None
             print(f"成功生成元数据向量，维度：{vector.shape}")
             return vector
             
@@ -518,17 +759,70 @@ CONTRACT_TEXT_PLACEHOLDER
         contract_type: str = "unknown",
     ) -> Tuple[Dict[str, Any], str]:
         """执行一次LLM调用并返回清理后的元数据与原始响应"""
-        if not contract_text or not contract_text.strip():
-            raise ValueError("合同文本不能为空")
+        prompt = self._build_extraction_prompt(contract_text, contract_type)
+        cache_key, response_text = self._lookup_cached_response(prompt)
+        from_cache = response_text is not None
+        if not from_cache:
+            response_text = self._call_llm_api(prompt)
+        metadata = self._parse_json_response(response_text)
+        cleaned_metadata = self._validate_and_clean_metadata(metadata)
+        if not from_cache:
+            self._store_cached_response(cache_key, response_text)
+        return cleaned_metadata, response_text
 
-        prompt_template = self._get_prompt_template(contract_type)
-        prompt = prompt_template.replace("CONTRACT_TEXT_PLACEHOLDER", contract_text)
+    def _extract_metadata_core_batch(
+        self,
+        contract_texts: List[str],
+        contract_type: str = "unknown",
+    ) -> List[Tuple[Dict[str, Any], str]]:
+        """将多份合同合并为一次LLM调用，返回与输入一一对应的清理后元数据与原始响应"""
+        if len(contract_texts) == 1:
+            return [self._extract_metadata_core(contract_texts[0], contract_type)]
 
-        response_text = self._call_llm_api(prompt)
+        if any(not text or not text.strip() for text in contract_texts):
+            raise ValueError("合同文本不能为空")
+
+        header, footer = self._get_batch_prompt_template(len(contract_texts))
+        sections = "".join(
+            f"CONTRACT_{index}:\n{text}\n\n" for index, text in enumerate(contract_texts, start=1)
+        )
+        # 输出长度随合同数量增长，按份数放宽 max_tokens
+        prompt = header + sections + footer
+        max_tokens = 2000 * len(contract_texts)
+        cache_key, response_text = self._lookup_cached_response(prompt, max_tokens)
+        from_cache = response_text is not None
+        if not from_cache:
+            response_text = self._call_llm_api(prompt, max_tokens=max_tokens)
+        metadata_list = self._parse_json_array_response(response_text, len(contract_texts))
+        results = [(self._validate_and_clean_metadata(metadata), response_text) for metadata in metadata_list]
+        if not from_cache:
+            self._store_cached_response(cache_key, response_text)
+        return results
+
+    async def _extract_metadata_core_async(
+        self,
+        contract_text: str,
+        contract_type: str = "unknown",
+    ) -> Tuple[Dict[str, Any], str]:
+        """_extract_metadata_core 的异步版本"""
+        prompt = self._build_extraction_prompt(contract_text, contract_type)
+        cache_key, response_text = self._lookup_cached_response(prompt)
+        from_cache = response_text is not None
+        if not from_cache:
+            response_text = await self._call_llm_api_async(prompt)
         metadata = self._parse_json_response(response_text)
         cleaned_metadata = self._validate_and_clean_metadata(metadata)
+        if not from_cache:
+            self._store_cached_response(cache_key, response_text)
         return cleaned_metadata, response_text
 
+    def _build_extraction_prompt(self, contract_text: str, contract_type: str) -> str:
+        if not contract_text or not contract_text.strip():
+            raise ValueError("合同文本不能为空")
+
+        prompt_template = self._get_prompt_template(contract_type)
+        return prompt_template.replace("CONTRACT_TEXT_PLACEHOLDER", contract_text)
+
     def extract_metadata(self, contract_text: str, contract_type: str = "unknown") -> Tuple[Dict[str, Any], Optional[np.ndarray]]:
         """
         从合同文本中提取元数据并生成向量
@@ -577,6 +871,50 @@ CONTRACT_TEXT_PLACEHOLDER
             }
             return error_result, None
 
+    async def extract_metadata_async(
+        self,
+        contract_text: str,
+        contract_type: str = "unknown",
+    ) -> Tuple[Dict[str, Any], Optional[np.ndarray]]:
+        """
+        extract_metadata 的异步版本，供 API 在事件循环中直接调用
+
+        LLM 请求通过异步 HTTP 客户端发出；向量服务仍为同步客户端，放到线程中执行。
+        """
+        if not self.api_key:
+            message = "DeepSeek API 密钥未配置（请设置环境变量 CONTRACT_API_KEY），已跳过 LLM 元数据提取。"
+            print(message)
+            error_result = {
+                'success': False,
+                'error': message,
+                'metadata': None,
+                'raw_response': None
+            }
+            return error_result, None
+
+        try:
+            cleaned_metadata, response_text = await self._extract_metadata_core_async(contract_text, contract_type)
+
+            # 生成元数据向量
+            metadata_vector = await asyncio.to_thread(self._generate_metadata_vector, cleaned_metadata)
+
+            result = {
+                'success': True,
+                'metadata': cleaned_metadata,
+                'raw_response': response_text
+            }
+
+            return result, metadata_vector
+
+        except Exception as e:
+            error_result = {
+                'success': False,
+                'error': str(e),
+                'metadata': None,
+                'raw_response': None
+            }
+            return error_result, None
+
     def extract_metadata_from_long_text(
         self,
         full_text: str,
@@ -612,15 +950,28 @@ CONTRACT_TEXT_PLACEHOLDER
         raw_responses: List[str] = []
         partial_errors: List[str] = []
 
-        for index, chunk in enumerate(chunks, start=1):
-            try:
-                chunk_metadata, chunk_raw = self._extract_metadata_core(chunk, contract_type)
-                metadata_results.append(chunk_metadata)
-                raw_responses.append(f"Chunk {index}:\n{chunk_raw}")
-            except Exception as exc:  # noqa: BLE001 - 捕获单块异常并继续
-                error_message = f"第 {index} 块提取失败: {exc}"
-                print(error_message)
-                partial_errors.append(error_message)
+        # 每 batch_size 块合并为一次LLM调用，摊薄每次请求的网络与排队开销；
+        # 合并调用失败（如返回的数组数量不符）时，该批逐块回退为单次调用
+        for start in range(0, len(chunks), self.batch_size):
+            batch = chunks[start:start + self.batch_size]
+            if len(batch) > 1:
+                try:
+                    extracted = self._extract_metadata_core_batch(batch, contract_type)
+                    metadata_results.extend(chunk_metadata for chunk_metadata, _ in extracted)
+                    raw_responses.append(f"Chunks {start + 1}-{start + len(batch)}:\n{extracted[0][1]}")
+                    continue
+                except Exception as exc:  # noqa: BLE001 - 合并调用失败时逐块重试
+                    print(f"合并提取失败，逐块重试: {exc}")
+
+            for index, chunk in enumerate(batch, start=start + 1):
+                try:
+                    chunk_metadata, chunk_raw = self._extract_metadata_core(chunk, contract_type)
+                    metadata_results.append(chunk_metadata)
+                    raw_responses.append(f"Chunk {index}:\n{chunk_raw}")
+                except Exception as exc:  # noqa: BLE001 - 捕获单块异常并继续
+                    error_message = f"第 {index} 块提取失败: {exc}"
+                    print(error_message)
+                    partial_errors.append(error_message)
 
         if not metadata_results:
             joined_errors = "; ".join(partial_errors) if partial_errors else "未知错误"
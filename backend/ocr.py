@@ -26,7 +26,7 @@ class MultiModalTextExtractor:
             images = convert_from_path(
                 pdf_path,
                 dpi=dpi,
-                fmt='jpeg',
+                fmt='ppm',  # 无压缩格式，省去 JPEG 编码与解码
                 thread_count=4,
                 output_file=uuid.uuid4().hex
             )
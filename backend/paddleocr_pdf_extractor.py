@@ -44,7 +44,7 @@ class PaddleOCRPDFExtractor:
             images = convert_from_bytes(
                 pdf_bytes,
                 dpi=dpi,
-                fmt='jpeg',
+                fmt='ppm',  # 无压缩格式，省去 JPEG 编码与解码
                 thread_count=4,
                 output_file=uuid.uuid4().hex
             )
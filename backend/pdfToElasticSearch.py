@@ -1,12 +1,14 @@
-from pdfToText import MultiModalTextExtractor
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Union
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union
 
-from elasticsearch import Elasticsearch
+from es_client import get_es_client
 from fastapi import HTTPException, UploadFile
 
 from llm_metadata_extractor import MetadataExtractor
-from embedding_client import RemoteEmbeddingClient
+from embedding_client import RemoteEmbeddingClient, get_embedding_client, quantize_to_int8
+
+if TYPE_CHECKING:  # 仅用于类型标注；运行时在首次提取文本时才导入（依赖 pdf2image/PIL）
+    from pdfToText import MultiModalTextExtractor
 
 StatusCallback = Optional[Callable[[str, Dict[str, Any]], None]]
 
@@ -27,7 +29,7 @@ class PDFTextExtractor:
         table_enable (bool): 是否启用表格提取，默认为True
         formula_enable (bool): 是否启用公式提取，默认为False
         """
-        self.extractor: Optional[MultiModalTextExtractor] = None
+        self.extractor: Optional["MultiModalTextExtractor"] = None
 
     def extract_text(self, pdf_bytes, pdf_name=None):
         """
@@ -41,6 +43,8 @@ class PDFTextExtractor:
         list: 包含每页文本信息的JSON格式列表
         """
         if self.extractor is None:
+            from pdfToText import MultiModalTextExtractor
+
             self.extractor = MultiModalTextExtractor()
         return self.extractor.extract_pdf_bytes(pdf_bytes, pdf_name)
 
@@ -48,8 +52,8 @@ class JSONToElasticsearch:
     def __init__(self, es_host: str ="http://localhost:9200", model_name: str ="bge-m3", index_name: str ="contracts_unified"):
         self.embedding_client: Optional[RemoteEmbeddingClient] = None
         try:
-            self.es = Elasticsearch(es_host)
-            self.embedding_client = RemoteEmbeddingClient(model=model_name)
+            self.es = get_es_client(es_host)
+            self.embedding_client = get_embedding_client(model_name)
             self.index_name = index_name
             self.metadata_extractor = MetadataExtractor()
             if not self.es.ping():
@@ -91,7 +95,7 @@ class JSONToElasticsearch:
             vector_results = self.embedding_client.embed(text)
             if not vector_results:
                 raise ValueError("Remote embedding service returned empty result")
-            vector = vector_results[0]
+            vector = quantize_to_int8(vector_results[0])
 
             # 构建基础文档
             document = {
@@ -169,26 +173,31 @@ class JSONToElasticsearch:
             }
 
             if metadata_vector is not None:
-                update_data["document_metadata"]["metadata_vector"] = metadata_vector.tolist()
+                # 共享客户端使用 orjson 序列化，可直接写入 numpy 数组
+                update_data["document_metadata"]["metadata_vector"] = metadata_vector
                 result['metadata_vector_generated'] = True
                 print(f"成功生成元数据向量，维度: {metadata_vector.shape}")
             else:
                 print("元数据向量生成失败")
 
+            # 只需要第一页文档的 _id：使用 filter 免打分，不返回 _source，也不统计总命中数
             query = {
                 "query": {
                     "bool": {
-                        "must": [
+                        "filter": [
                             {"term": {"contractName": contract_name}},
                             {"term": {"pageId": 1}}
                         ]
                     }
-                }
+                },
+                "_source": False,
+                "track_total_hits": False,
+                "size": 1
             }
 
             search_result = self.es.search(index=self.index_name, body=query)
 
-            if search_result['hits']['total']['value'] == 0:
+            if not search_result['hits']['hits']:
                 message = f"未找到合同 {contract_name} 的第一页文档"
                 print(message)
                 result['error'] = message
@@ -81,7 +81,7 @@ class MultiModalTextExtractor:
         images = convert_from_path(
             str(pdf_path),
             dpi=dpi,
-            fmt="jpeg",
+            fmt="ppm",  # 无压缩格式，省去 JPEG 编码与解码
             thread_count=4,
             output_folder=None,
             use_pdftocairo=True,
@@ -93,7 +93,8 @@ async def upload_document(file: UploadFile = File(...)):
 
         # 使用处理器解析PDF并切块
         try:
-            chunks = processor.process_document(temp_path, file.filename)
+            # process_document 逐块产出，需在删除临时文件前读取完毕
+            chunks = list(processor.process_document(temp_path, file.filename))
         finally:
             # 清理临时文件
             try:
@@ -5,7 +5,9 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-from elasticsearch import Elasticsearch, exceptions as es_exceptions
+from elasticsearch import exceptions as es_exceptions
+
+from es_client import get_es_client
 
 
 class UploadStatusManager:
@@ -25,7 +27,7 @@ class UploadStatusManager:
         es_host: str = "http://localhost:9200",
         index_name: str = "contract_upload_status",
     ) -> None:
-        self.es = Elasticsearch(es_host)
+        self.es = get_es_client(es_host)
         self.index_name = index_name
         self._ensure_index()
 
@@ -251,28 +251,16 @@ const formatDateDisplay = (value?: string | null): string => {
 
 interface DocumentDetail {
   contract_name: string;
-  dataType?: string;
-  totalPages?: number;
-  totalChars?: number;
-  extractionStatus?: string;
-  uploadTime?: string;
-  fileSize?: string;
-  metadataStatus?: string;
+  data_type?: string;
+  total_pages?: number;
+  total_chars?: number;
+  extraction_status?: string;
+  upload_time?: string | null;
+  upload_time_display?: string | null;
+  file_size?: string | null;
+  file_name?: string;
   metadata_status?: string;
-  structuredData?: {
-    signing_date?: string;
-    customer_name?: string;
-    our_entity?: string;
-    party_a?: string;
-    party_b?: string;
-    customer_category_level1?: string;
-    customer_category_level2?: string;
-    contract_type?: string;
-    contract_amount?: number;
-    contract_content_summary?: string;
-    positions?: string;
-    personnel_list?: string;
-  } | null;
+  has_metadata?: boolean;
   document_metadata?: Record<string, unknown> | null;
   pages?: Array<{
     pageId?: number;
@@ -474,7 +462,7 @@ const UploadPage: FC<UploadPageProps> = ({ uploadPassword, onPasswordInvalid })
       // 先尝试获取文档详情，看是否已有元数据
       const detailResponse = await getDocumentDetail(contractKey);
       const detail = detailResponse?.data ?? detailResponse;
-      const rawMetadata = detail?.document_metadata ?? detail?.structuredData ?? detail?.structured_data;
+      const rawMetadata = detail?.document_metadata;
       const metadataObject = (rawMetadata && typeof rawMetadata === 'object') ? rawMetadata as Record<string, unknown> : null;
       const normalizedMetadata = normalizeContractMetadata(metadataObject, actualFileName);
       
@@ -762,11 +750,7 @@ const UploadPage: FC<UploadPageProps> = ({ uploadPassword, onPasswordInvalid })
   }, [documents, fetchDocuments]);
 
   const detailMetadataRaw = detailData && typeof detailData === 'object'
-    ? (
-      detailData.document_metadata && typeof detailData.document_metadata === 'object'
-        ? detailData.document_metadata
-        : detailData.structuredData ?? (detailData as unknown as Record<string, unknown>)?.['structured_data']
-    )
+    ? detailData.document_metadata
     : null;
 
   const detailMetadataSource = detailMetadataRaw && typeof detailMetadataRaw === 'object'
@@ -777,8 +761,7 @@ const UploadPage: FC<UploadPageProps> = ({ uploadPassword, onPasswordInvalid })
     ? normalizeContractMetadata(detailMetadataSource, detailData?.contract_name || `${selectedContractKey ?? ''}.pdf`)
     : null;
 
-  const detailMetadataStatus = detailData?.metadataStatus?.toLowerCase()
-    ?? detailData?.metadata_status?.toLowerCase();
+  const detailMetadataStatus = detailData?.metadata_status?.toLowerCase();
 
   const detailMetadataReady = Boolean(detailMetadataSource && (
     detailMetadataStatus === 'completed' || detailMetadataStatus === 'extracted'
@@ -845,9 +828,9 @@ const UploadPage: FC<UploadPageProps> = ({ uploadPassword, onPasswordInvalid })
             {/* 中部 2：合同总页数、上传时间 */}
             <Divider orientation="left">文档信息</Divider>
             <Descriptions size="small" column={3}>
-              <Descriptions.Item label="总页数">{detailData.totalPages ?? '-'}</Descriptions.Item>
-              <Descriptions.Item label="上传时间">{detailData.uploadTime ?? '-'}</Descriptions.Item>
-              <Descriptions.Item label="文件大小">{detailData.fileSize ?? '-'}</Descriptions.Item>
+              <Descriptions.Item label="总页数">{detailData.total_pages ?? '-'}</Descriptions.Item>
+              <Descriptions.Item label="上传时间">{detailData.upload_time_display ?? '-'}</Descriptions.Item>
+              <Descriptions.Item label="文件大小">{detailData.file_size ?? '-'}</Descriptions.Item>
             </Descriptions>
 
             {/* 中部 3：OCR 文档块文本内容（按页）*/}